@@ -1,19 +1,11 @@
 import pandas as pd
 import seaborn as sns
 import matplotlib.pyplot as plt
+from utils import read_results
 
-for package in ['pytorch']:
-    dfs = []
-    #for ext in ["wav", "mp3", "mp4", "ogg", "flac"]:
-    for ext in ["wav"]:
-        try:
-            dfs.append(
-                pd.read_pickle("results/benchmark_%s_%s.pickle" % (package, ext))
-            )
-        except FileNotFoundError:
-            continue
-
-    df = pd.concat(dfs, ignore_index=True)
+for package in ['memory']:
+    df = read_results("results/benchmark")
+    df = df[(df['measure'] == 'memory') & (df['workers'] == 0) & (df['dtype'] == 'float32')]
 
     sns.set_style("whitegrid")
 
@@ -23,7 +15,7 @@ for package in ['pytorch']:
 
     metrics = [
         ("time", "Load Time per File (s, log scale)", True),
-        ("mem_used_MB", "Memory Usage (KB)", False),
+        ("peak_rss_delta_MB", "Peak Memory over Baseline (MB)", False),
         ("throughput_files_per_sec", "Throughput (files/sec)", False),
     ]
 
@@ -0,0 +1,385 @@
+"""
+Matrix-driven benchmark runner.
+
+Expands a declarative sweep over extension, loader, channels, sample rate,
+duration, DataLoader workers, dtype and repeat into cells, and runs every cell in its own
+interpreter (see worker.py). On Linux each running cell is pinned to its
+own physical cores (all SMT siblings of a core go to the same cell), and
+cells whose cores do not overlap run at the same time, so a full sweep on
+a many-core host takes a fraction of the serial wall time. The runner
+itself stays on the `--reserve-cores` first cores. Results go to a
+`utils.ResultStore`, so reruns only measure the missing cells. With
+`--generate`, the corpus is first brought up to date with the sweep's
+`corpus` options (see generate_audio.py), so it is never stale. Sweeping
+`channels` or `sample_rate` uses one corpus per combination, in the
+sub-directories `<root>/<channels>ch_<sample_rate>hz`; scaling.py fits
+the time and memory of every loader against these dimensions. With
+`--profile`, every cell is run once more under a sampling profiler (see
+profiler.py), its collapsed stacks are written to `<out>/profiles` and the
+top hotspots of every loader to `<out>/profiles/hotspots.csv`. The
+`pagecache` measure times every loader with its files evicted from the
+page cache before each pass (see pagecache.py) and again with them cached.
+The `training` measure emulates an epoch of a training job: random
+fixed-length crops of the files in a new shuffled order every epoch,
+optionally resampled, batched by a DataLoader with `workers` workers, timed
+per batch (see `worker.run_training`).
+
+    python benchmark.py --sweep sweep.json
+    python benchmark.py --ext wav mp3 --libs soundfile pydub --workers 0 4 --dtype float32 int16
+    python benchmark.py --generate --root AUDIO_SCALING --ext wav flac ogg mp4 --channels 1 2 8 --sample-rate 48000 96000 --durations 1 60 600 3600
+"""
+import argparse
+import functools
+import itertools
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import generate_audio
+import loaders
+import manifest
+import profiler
+import timing
+import utils
+import worker
+from dataset import duration_cells
+
+
+SWEEP = dict(
+    root='AUDIO',
+    ext=list(loaders.FFMPEG_FORMATS),
+    lib=None,
+    channels=None,
+    sample_rate=None,
+    duration=None,
+    measure=['memory'],
+    workers=[0],
+    dtype=['float32'],
+    repeat=[timing.DEFAULTS['repeat']],
+    tensor=True,
+    corpus=None,
+    training=None,
+)
+
+# options of the `training` measure, updated from the sweep's `training`
+TRAINING = dict(
+    batch_size=16,
+    crop_seconds=1.0,
+    sample_rate=None,
+)
+
+CELL = ['ext', 'lib', 'channels', 'sample_rate', 'duration', 'measure', 'workers', 'dtype', 'repeat']
+
+COLUMNS = CELL + [
+    'cpus',
+    'throughput_files_per_sec',
+    'samples_per_sec',
+    'baseline_rss_MB',
+    'peak_rss_MB',
+    'peak_rss_delta_MB',
+    'tracemalloc_peak_MB',
+    'children_peak_rss_MB',
+    'process_time',
+    'torch_import_time',
+    'import_time',
+    'first_call_time',
+    'warm_time',
+    'cold_time',
+    'cold_time_p95',
+    'warm_time_p95',
+    'cold_warm_ratio',
+    'cold_disk_read_KB',
+    'warm_disk_read_KB',
+    'evicted',
+    'batch_size',
+    'crop_seconds',
+    'resample',
+    'items_per_sec',
+    'total_file_size_KB',
+    'file_size_KB',
+] + loaders.PHASE_COLUMNS + timing.COLUMNS
+
+
+def load_sweep(path=None, **overrides):
+    """`SWEEP`, updated from the JSON file `path` and the non-None `overrides`."""
+    sweep = dict(SWEEP)
+    if path is not None:
+        with open(path) as f:
+            sweep.update(json.load(f))
+    sweep.update({key: value for key, value in overrides.items() if value is not None})
+    return sweep
+
+
+def corpora(sweep):
+    """
+    `(root, channels, sample_rate)` of every corpus of the sweep: the
+    sub-directory of each combination of `channels` and `sample_rate`, or
+    `root` itself (with the format of its files) if neither is swept.
+    """
+    if not sweep['channels'] and not sweep['sample_rate']:
+        return [(sweep['root'], None, None)]
+    corpus = dict(generate_audio.DEFAULTS, **(sweep['corpus'] or {}))
+    return [
+        (os.path.join(sweep['root'], f"{channels}ch_{sample_rate}hz"), channels, sample_rate)
+        for channels in sweep['channels'] or [corpus['channels']]
+        for sample_rate in sweep['sample_rate'] or [corpus['sample_rate']]
+    ]
+
+
+def audio_format(fp, records=None):
+    """`(channels, sample_rate)` of `fp`, from the manifest if there is one."""
+    try:
+        info = records[fp] if records is not None else manifest.probe(fp)
+    except Exception as e:
+        print(f"[error] Probing '{fp}': {e}")
+        return None, None
+    return info['channels'], info['sampling_rate']
+
+
+def expand(sweep, records=None):
+    """`(cell, files, file_sizes)` of every cell of the sweep."""
+    for root, channels, sample_rate in corpora(sweep):
+        for ext in sweep['ext']:
+            cells = duration_cells(root, ext, records=records)
+            for lib in sweep['lib'] or loaders.available_loaders(ext):
+                if not loaders.get_loader(lib).supports(ext):
+                    print(f"[skip] Loader '{lib}' does not support '{ext}'")
+                    continue
+                for duration, files in cells:
+                    if not files or (sweep['duration'] and duration not in sweep['duration']):
+                        continue
+                    if records is None:
+                        sizes = [os.path.getsize(fp) for fp in files]
+                    else:
+                        sizes = [records[fp]['size'] for fp in files]
+                    if channels is None:
+                        cell_format = audio_format(files[0], records)
+                    else:
+                        cell_format = channels, sample_rate
+                    for measure, workers, dtype, repeat in itertools.product(
+                        sweep['measure'], sweep['workers'], sweep['dtype'], sweep['repeat']
+                    ):
+                        if measure in ('coldstart', 'pagecache') and workers:
+                            continue
+                        cell = dict(ext=ext, lib=lib, channels=cell_format[0], sample_rate=cell_format[1],
+                                    duration=duration, measure=measure, workers=workers, dtype=dtype,
+                                    repeat=repeat)
+                        yield cell, files, sizes
+
+
+def physical_cores(cpus):
+    """The CPUs in `cpus`, grouped into one list per physical core."""
+    cores = {}
+    for cpu in sorted(cpus):
+        try:
+            with open(f'/sys/devices/system/cpu/cpu{cpu}/topology/thread_siblings_list') as f:
+                siblings = f.read().strip()
+        except OSError:
+            siblings = str(cpu)
+        cores.setdefault(siblings, []).append(cpu)
+    return list(cores.values())
+
+
+class CoreAllocator(object):
+    """Hands out disjoint sets of physical cores to concurrently running cells."""
+
+    def __init__(self, cores):
+        self.cores = list(cores)
+        self.free = list(cores)
+        self._condition = threading.Condition()
+
+    def acquire(self, n):
+        n = max(1, min(n, len(self.cores)))
+        with self._condition:
+            while len(self.free) < n:
+                self._condition.wait()
+            taken, self.free = self.free[:n], self.free[n:]
+        return taken
+
+    def release(self, taken):
+        with self._condition:
+            self.free = sorted(self.free + taken)
+            self._condition.notify_all()
+
+
+def profile_path(store, cell):
+    return store.artifact(cell, '.collapsed', 'profiles')
+
+
+def run_cell(cell, files, sizes, store, allocator, args, tensor=True, training=None):
+    # the main process and every DataLoader worker get a core of their own;
+    # page cache cells evict the corpus, so they run alone
+    n_cores = len(allocator.cores) if allocator and cell['measure'] == 'pagecache' else cell['workers'] + 1
+    cores = allocator.acquire(n_cores) if allocator else None
+    cpus = sorted(cpu for core in cores for cpu in core) if cores else None
+    runner = 'dataloader' if cell['measure'] == 'memory' and cell['workers'] else cell['measure']
+    spawn = functools.partial(
+        worker.spawn, runner, cell['lib'], files,
+        options=dict(timing.options(args), repeat=cell['repeat']),
+        tensor=tensor, dtype=cell['dtype'],
+        num_workers=cell['workers'] if runner in ('dataloader', 'training') else None,
+        cpus=cpus,
+        training=training if runner == 'training' else None,
+    )
+    name = ' | '.join(f'{key}={value}' for key, value in cell.items())
+    try:
+        if not store.done(**cell):
+            result = spawn()
+            unit = 'batch' if runner == 'training' else 'file'
+            print(f"[Timing] {name} | cpus={cpus} | mean={result['time']:.6f}s | p95={result['time_p95']:.6f}s per {unit}")
+            store.write(cell, [dict(
+                cpus=' '.join(map(str, cpus)) if cpus else '',
+                total_file_size_KB=sum(sizes) / 1024,
+                file_size_KB=sum(sizes) / 1024 / len(files),
+                **result
+            )])
+        if args.profile and not os.path.exists(profile_path(store, cell)):
+            # a run of its own, so that the sampling does not bias the stored times
+            spawn(profile=profile_path(store, cell), profiler=args.profile)
+            print(f"[Profile] {name} | written to '{profile_path(store, cell)}'")
+    except Exception as e:
+        print(f"[error] {cell}: {e}")
+    finally:
+        if cores:
+            allocator.release(cores)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Run a declarative benchmark sweep.')
+    parser.add_argument('--sweep', type=str, default=None,
+                        help='JSON file with the sweep (keys: %s); command line options override it.' % ', '.join(SWEEP))
+    parser.add_argument('--root', type=str, default=None)
+    parser.add_argument('--ext', type=str, nargs='+', default=None)
+    parser.add_argument('--libs', type=str, nargs='+', default=None,
+                        help='Loaders from the registry in loaders.py (default: all installed loaders supporting the extension).')
+    parser.add_argument('--durations', type=int, nargs='+', default=None,
+                        help='Durations (sub-directories of --root) to run (default: all).')
+    parser.add_argument('--measure', type=str, nargs='+', default=None, choices=['memory', 'coldstart', 'pagecache', 'training'],
+                        help='Steady-state time and memory (in a DataLoader if workers > 0), cold start, cold versus warm page cache, or shuffled random crops in a DataLoader.')
+    parser.add_argument('--workers', type=int, nargs='+', default=None,
+                        help='DataLoader num_workers; 0 loads in the benchmark process.')
+    parser.add_argument('--dtype', type=str, nargs='+', default=None, choices=loaders.DTYPES)
+    parser.add_argument('--batch-size', type=int, default=None,
+                        help='Batch size of the training measure (default: %d).' % TRAINING['batch_size'])
+    parser.add_argument('--crop-seconds', type=float, default=None,
+                        help='Random crop length of the training measure (default: %g).' % TRAINING['crop_seconds'])
+    parser.add_argument('--resample', type=int, default=None,
+                        help='Resample the crops of the training measure to this rate (default: no resampling).')
+    parser.add_argument('--repeats', type=int, nargs='+', default=None,
+                        help='Minimum numbers of timed passes (overrides --repeat).')
+    parser.add_argument('--no-tensor', action='store_true', help='Benchmark decoding only without converting to tensor.')
+    parser.add_argument('--reserve-cores', type=int, default=1,
+                        help='Physical cores kept for the runner and the system, not used by cells.')
+    parser.add_argument('--parallel', type=int, default=None,
+                        help='Maximum number of cells running at once (default: as many as there are free cores).')
+    parser.add_argument('--no-pin', action='store_true',
+                        help='Neither pin cells to cores nor run them in parallel.')
+    parser.add_argument('--out', type=str, default='results/benchmark')
+    parser.add_argument('--profile', type=str, nargs='?', const='auto', default=None,
+                        choices=['auto', 'py-spy', 'python'],
+                        help='Also run every cell under a sampling profiler: py-spy with native frames (auto, if installed) or Python frames only.')
+    parser.add_argument('--hotspots', type=int, default=10,
+                        help='Number of hotspots per loader in the profile summary.')
+    parser.add_argument('--generate', action='store_true',
+                        help="Generate the missing or outdated files of the corpus (options from the sweep's 'corpus' and below) before running.")
+    generate_audio.add_arguments(parser, sweep=True)
+    manifest.add_arguments(parser)
+    timing.add_arguments(parser)
+    args = parser.parse_args()
+
+    sweep = load_sweep(
+        args.sweep,
+        root=args.root,
+        ext=args.ext,
+        lib=args.libs,
+        channels=args.channels,
+        sample_rate=args.sample_rate,
+        duration=args.durations,
+        measure=args.measure,
+        workers=args.workers,
+        dtype=args.dtype,
+        repeat=args.repeats,
+        tensor=False if args.no_tensor else None,
+    )
+    if args.repeats is None and args.sweep is None:
+        sweep['repeat'] = [args.repeat]
+
+    training = dict(TRAINING, **(sweep['training'] or {}))
+    training.update({key: value for key, value in (('batch_size', args.batch_size),
+                                                     ('crop_seconds', args.crop_seconds),
+                                                     ('sample_rate', args.resample)) if value is not None})
+
+    written = 0
+    if args.generate:
+        corpus = dict(sweep['corpus'] or {}, formats=sweep['ext'])
+        if sweep['duration']:
+            corpus['durations'] = sweep['duration']
+        corpus.update({key: getattr(args, key) for key in ('bit_depth', 'bitrate', 'seed')
+                       if getattr(args, key) is not None})
+        for root, channels, sample_rate in corpora(sweep):
+            if channels is not None:
+                corpus.update(channels=channels, sample_rate=sample_rate)
+            written += generate_audio.generate(root, **corpus)
+
+    records = None
+    if args.manifest is not None:
+        records = manifest.load(args.manifest, root=sweep['root'], refresh=args.refresh_manifest or written > 0)
+
+    # the options that are not part of the cells; only training cells depend on `training`
+    config = dict(timing.options(args), tensor=sweep['tensor'])
+    del config['repeat']
+    stores = {
+        measure: utils.ResultStore(args.out, COLUMNS, config=dict(
+            config, **(dict(training=training) if measure == 'training' else {})
+        ))
+        for measure in sweep['measure']
+    }
+    expanded = list(expand(sweep, records))
+    cells = []
+    for cell, files, sizes in expanded:
+        store = stores[cell['measure']]
+        if store.done(**cell) and not (args.profile and not os.path.exists(profile_path(store, cell))):
+            print(f"[skip] {cell} already in '{args.out}'")
+            continue
+        cells.append((cell, files, sizes))
+    print(f"[Sweep] {len(cells)} cells to run")
+
+    allocator = None
+    parallel = 1
+    if not args.no_pin and hasattr(os, 'sched_getaffinity'):
+        all_cores = physical_cores(os.sched_getaffinity(0))
+        # with too few cores, the cells share them with the runner
+        cores = all_cores[args.reserve_cores:] or all_cores
+        if cores is not all_cores and args.reserve_cores:
+            os.sched_setaffinity(0, [cpu for core in all_cores[:args.reserve_cores] for cpu in core])
+        allocator = CoreAllocator(cores)
+        parallel = args.parallel or len(cores)
+        print(f"[Sweep] {len(cores)} physical cores for cells | up to {parallel} cells at once")
+
+    with ThreadPoolExecutor(parallel) as pool:
+        futures = [
+            pool.submit(run_cell, cell, files, sizes, stores[cell['measure']], allocator, args, tensor=sweep['tensor'],
+                        training=training)
+            for cell, files, sizes in cells
+        ]
+        for future in futures:
+            future.result()
+
+    if args.profile:
+        profiles = [(cell, profile_path(stores[cell['measure']], cell)) for cell, _, _ in expanded
+                    if os.path.exists(profile_path(stores[cell['measure']], cell))]
+        # cells with DataLoader workers or of other measures spend their time elsewhere
+        keys = ['lib', 'ext', 'measure', 'workers']
+        summary = profiler.summarize(profiles, keys, top=args.hotspots)
+        summary_path = os.path.join(args.out, 'profiles', 'hotspots.csv')
+        summary.to_csv(summary_path, index=False)
+        for group, hotspots in summary.groupby(keys, sort=False):
+            name = ' | '.join(f'{key}={value}' for key, value in zip(keys, group))
+            print(f"\n[Hotspots] {name} | {hotspots.n_samples.iloc[0]} samples")
+            for row in hotspots.itertuples():
+                print(f"  {row.rank:2d}. self={row.self_fraction:6.1%} | total={row.total_fraction:6.1%} | {row.frame}")
+        print(f"Profile summary saved to: {summary_path}")
+
+    print(f"Benchmark results saved to: {args.out}")
@@ -0,0 +1,110 @@
+import os
+import os.path
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import utils
+import loaders
+import manifest
+import timing
+
+
+class Info(object):
+    """Consecutive-call and single-open metadata functions of a backend."""
+
+    def __init__(self, name):
+        _, _, self.consecutive, self.single = loaders.INFO_FUNCTIONS[name]
+
+
+def bench_consecutive(info, files, args):
+    """One call per field, as in the README's metadata benchmark."""
+    return [timing.measure(info.consecutive, files, **timing.options(args))]
+
+
+def bench_single(info, files, args):
+    """All fields from a single open of the file."""
+    return [timing.measure(info.single, files, **timing.options(args))]
+
+
+def bench_parallel(info, files, args):
+    """
+    Single-open metadata of all files of the cell from a thread pool, as
+    when indexing a corpus. One timed call is one pass over the files.
+    """
+    rows = []
+    for workers in args.workers:
+        with ThreadPoolExecutor(workers) as pool:
+            def call(files):
+                list(pool.map(info.single, files))
+
+            result = timing.measure(call, [files], **timing.options(args))
+        print(f"[Parallel] workers={workers} | {len(files) / result['time']:.2f} files/sec")
+        rows.append(dict(workers=workers, files_per_sec=len(files) / result['time'], **result))
+    return rows
+
+
+MODES = {
+    'consecutive': bench_consecutive,
+    'single': bench_single,
+    'parallel': bench_parallel,
+}
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Benchmark reading audio metadata.')
+    parser.add_argument('--ext', type=str, nargs='+', default=list(loaders.FFMPEG_FORMATS))
+    parser.add_argument('--root', type=str, default="AUDIO",
+                        help='Corpus directory with one sub-directory per duration in seconds.')
+    manifest.add_arguments(parser)
+    parser.add_argument('--libs', type=str, nargs='+', default=None,
+                        help='Metadata backends from loaders.INFO_FUNCTIONS (default: all installed backends supporting --ext).')
+    parser.add_argument('--modes', type=str, nargs='+', default=sorted(MODES), choices=sorted(MODES),
+                        help='Open the file once per field (consecutive), once for all fields (single), or single-open from a thread pool (parallel).')
+    parser.add_argument('--workers', type=int, nargs='+', default=utils.default_worker_counts()[1:],
+                        help='Thread counts to sweep in parallel mode.')
+    timing.add_arguments(parser)
+    args = parser.parse_args()
+
+    columns = [
+        'ext',
+        'lib',
+        'duration',
+        'mode',
+        'workers',
+        'files_per_sec',
+    ] + timing.COLUMNS
+
+    out_path = "results/benchmark_metadata"
+    # only the parallel mode depends on the worker counts
+    stores = {
+        mode: utils.ResultStore(out_path, columns, config=dict(
+            timing.options(args), **(dict(workers=args.workers) if mode == 'parallel' else {})
+        ))
+        for mode in args.modes
+    }
+    records = None
+    if args.manifest is not None:
+        records = manifest.load(args.manifest, root=args.root, refresh=args.refresh_manifest)
+    for ext in args.ext:
+        cells = manifest.duration_cells(args.root, ext, records=records)
+        libs = args.libs or loaders.available_info(ext)
+        for lib in libs:
+            print(f"\n===== Testing metadata backend: {lib} | ext={ext} =====")
+            info = Info(lib)
+            for duration, files in cells:
+                if not files:
+                    continue
+                for mode in args.modes:
+                    cell = dict(ext=ext, lib=lib, duration=duration, mode=mode)
+                    store = stores[mode]
+                    if store.done(**cell):
+                        print(f"[skip] duration={duration}s | mode={mode} already in '{out_path}'")
+                        continue
+                    print(f"[Dataset] duration={duration}s | Num_files={len(files)} | mode={mode}")
+                    rows = MODES[mode](info, files, args)
+                    for row in rows:
+                        row.setdefault('workers', 0)
+                        row.setdefault('files_per_sec', 1.0 / row['time'])
+                    store.write(cell, rows)
+
+    print(f"Benchmark results saved to: {out_path}")
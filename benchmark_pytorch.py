@@ -5,128 +5,569 @@ import os
 import os.path
 import random
 import time
+import tracemalloc
 import argparse
-import librosa
+import functools
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import utils
 import loaders
+from dataset import AudioFolder, DurationBucketSampler, duration_cells, pad_collate
+import cache
+import prefetch
+import manifest
+import timing
+import worker
+import numpy as np
 import torch
-import glob
-
-def get_files(root_dir, extension):
-    root_dir = os.path.expanduser(root_dir)
-    pattern = os.path.join(root_dir, '**', f'*.{extension}')
-    files = glob.glob(pattern, recursive=True)
-    print(f"[get_files] Found {len(files)} '*.{extension}' files under {root_dir}")
-    return files
-
-class AudioFolder(torch.utils.data.Dataset):
-    def __init__(
-        self,
-        root,
-        extension='wav',
-        lib="librosa",
-    ):
-        self.root = os.path.expanduser(root)
-        self.data = []
-        self.audio_files = get_files(self.root, extension)
-        print(f"[AudioFolder] Loader='{lib}' | Directory='{self.root}' | Files={len(self.audio_files)}")
-        self.loader_function = getattr(loaders, lib)
-
-    def __getitem__(self, index):
-        fp = self.audio_files[index]
+
+
+def bench_time(dataset, args):
+    calls = [0]
+
+    def call(fp):
+        audio = dataset.loader_function(fp)
+        _ = loaders.as_tensor(audio).max()
+        calls[0] += 1
+
+    loaders.reset_phases()
+    result = timing.measure(call, dataset.audio_files, **timing.options(args))
+    result.update(loaders.phase_times(calls[0]))
+    print(f"[Timing] mean={result['time']:.6f}s | p50={result['time_p50']:.6f}s | p95={result['time_p95']:.6f}s | p99={result['time_p99']:.6f}s | n={result['n_samples']}")
+    phases = ' | '.join(f"{phase}={result[column]:.6f}s" for phase, column in zip(loaders.PHASES, loaders.PHASE_COLUMNS))
+    print(f"[Phases] {phases} per file")
+    return [result]
+
+
+def bench_dataloader(dataset, args):
+    """
+    Iterate a real DataLoader over the dataset for every combination of
+    num_workers, prefetch_factor and persistent_workers.
+    Worker start-up is part of the measurement, persistent workers are
+    only started once for all `repeat` epochs. The DataLoader is timed per
+    epoch, the per-batch timing engine does not apply here.
+    """
+    rows = []
+    for num_workers in args.workers:
+        # prefetch_factor and persistent_workers are only valid with workers
+        prefetch_factors = args.prefetch_factor if num_workers > 0 else [None]
+        persistent = args.persistent_workers if num_workers > 0 else [0]
+        for prefetch_factor in prefetch_factors:
+            for persistent_workers in persistent:
+                loader = torch.utils.data.DataLoader(
+                    dataset,
+                    batch_size=1,
+                    num_workers=num_workers,
+                    prefetch_factor=prefetch_factor,
+                    persistent_workers=bool(persistent_workers),
+                    shuffle=False
+                )
+                n_files = 0
+                n_samples = 0
+                start = time.time()
+                try:
+                    for i in range(args.repeat):
+                        for batch in loader:
+                            n_files += batch.shape[0]
+                            n_samples += batch.numel()
+                except Exception as e:
+                    print(f"[error] num_workers={num_workers}: {e}")
+                    n_files = n_samples = 0
+                end = time.time()
+                del loader
+
+                elapsed = end - start
+                files_per_sec = n_files / elapsed if n_files > 0 else float('nan')
+                samples_per_sec = n_samples / elapsed if n_files > 0 else float('nan')
+                print(f"[DataLoader] num_workers={num_workers} | prefetch_factor={prefetch_factor} | persistent_workers={bool(persistent_workers)} | {files_per_sec:.2f} files/sec | {samples_per_sec:.0f} samples/sec")
+                rows.append(dict(
+                    num_workers=num_workers,
+                    prefetch_factor=prefetch_factor,
+                    persistent_workers=bool(persistent_workers),
+                    time=elapsed / n_files if n_files > 0 else float('nan'),
+                    files_per_sec=files_per_sec,
+                    samples_per_sec=samples_per_sec,
+                ))
+    return rows
+
+
+def bench_excerpt(dataset, args):
+    """
+    Time loading a fixed-length crop at different relative offset positions
+    (0 is the start of the file, 1 the last possible crop). A loader that
+    seeks in O(1) shows flat latency over offset and duration, a loader that
+    decodes from the start grows with the offset.
+    """
+    if dataset.excerpt_function is None:
+        print("[skip] Loader has no excerpt variant")
+        return []
+
+    crops = {}
+    for fp in dataset.audio_files:
+        info = dataset.info[fp] if dataset.info is not None else manifest.probe(fp)
+        num_frames = int(args.excerpt_seconds * info['sampling_rate'])
+        crops[fp] = (info, num_frames)
+
+    rows = []
+    for position in args.offsets:
+        calls = []
+        for fp, (info, num_frames) in crops.items():
+            offset = int(position * max(info['samples'] - num_frames, 0))
+            calls.append((fp, offset, num_frames, offset / info['sampling_rate']))
+
+        def call(crop):
+            fp, offset, num_frames, _ = crop
+            audio = dataset.excerpt_function(fp, offset, num_frames)
+            _ = loaders.as_tensor(audio).max()
+
+        result = timing.measure(call, calls, **timing.options(args))
+        offset_seconds = sum(c[3] for c in calls) / len(calls) if calls else float('nan')
+        print(f"[Excerpt] position={position} | offset={offset_seconds:.2f}s | mean={result['time']:.6f}s | p95={result['time_p95']:.6f}s per crop")
+        rows.append(dict(
+            excerpt_seconds=args.excerpt_seconds,
+            position=position,
+            offset_seconds=offset_seconds,
+            **result
+        ))
+    return rows
+
+
+def bench_coldstart(dataset, args):
+    """
+    Run the loader in a fresh interpreter per cell, so that import time,
+    library initialization and the first decode are not hidden in the
+    average of warm calls.
+    """
+    if not dataset.audio_files:
+        return []
+    try:
+        result = worker.spawn('coldstart', dataset.lib, dataset.audio_files, options=timing.options(args))
+    except Exception as e:
+        print(f"[error] Cold start of {dataset.lib}: {e}")
+        return []
+    print(f"[ColdStart] process={result['process_time']:.3f}s | import={result['import_time']:.3f}s | first_call={result['first_call_time']:.6f}s | warm={result['warm_time']:.6f}s per file")
+    return [result]
+
+
+def bench_cache(dataset, args):
+    """
+    Load the dataset through AudioFolder with and without a decoded-audio
+    cache. The cached run starts empty, so its first pass is all misses and
+    the hit rate reflects the cache budget and the number of passes.
+    """
+    indices = list(range(len(dataset)))
+    options = dict(timing.options(args), warmup=0)
+
+    dataset.cache = None
+    uncached = timing.measure(dataset.__getitem__, indices, **options)
+
+    dataset.cache = cache.DecodedCache(args.cache_bytes, shared_dir=args.cache_dir)
+    dataset.cache.clear()
+    result = timing.measure(dataset.__getitem__, indices, **options)
+    hit_rate = dataset.cache.hit_rate
+    dataset.cache.clear()
+    dataset.cache = None
+
+    speedup = uncached['time'] / result['time']
+    print(f"[Cache] hit_rate={hit_rate:.2%} | uncached={uncached['time']:.6f}s | cached={result['time']:.6f}s | speedup={speedup:.2f}x")
+    result.update(
+        cache_bytes=args.cache_bytes,
+        shared=args.cache_dir is not None,
+        hit_rate=hit_rate,
+        time_uncached=uncached['time'],
+        speedup=speedup,
+    )
+    return [result]
+
+
+def bench_stream(dataset, args):
+    """
+    Throughput and peak memory of decoding every file as a stream of
+    fixed-size chunks, for each chunk size, next to loading the whole file
+    (frames_per_chunk=0). Every chunk size runs in its own interpreter.
+    """
+    chunk_sizes = [0]
+    if loaders.get_loader(dataset.lib).iter_chunks is not None:
+        chunk_sizes += args.frames_per_chunk
+    else:
+        print("[skip] Loader has no streaming variant, only loading whole files")
+
+    rows = []
+    for frames_per_chunk in chunk_sizes:
         try:
-            audio = self.loader_function(fp)
+            result = worker.spawn(
+                'memory', dataset.lib, dataset.audio_files,
+                options=timing.options(args), frames_per_chunk=frames_per_chunk
+            )
         except Exception as e:
-            print(f"[error] Loading '{fp}' with loader '{self.loader_function.__name__}': {e}")
-            raise
-        return torch.as_tensor(audio).view(1, 1, -1)
+            print(f"[error] frames_per_chunk={frames_per_chunk}: {e}")
+            continue
+        print(f"[Stream] frames_per_chunk={frames_per_chunk} | {result['samples_per_sec']:.0f} samples/sec | peak_rss_delta={result['peak_rss_delta_MB']:.2f}MB | tracemalloc_peak={result['tracemalloc_peak_MB']:.2f}MB")
+        rows.append(dict(frames_per_chunk=frames_per_chunk, **result))
+    return rows
+
+
+def bench_alloc(dataset, args):
+    """
+    Bytes allocated per call: the peak of the allocations traced by
+    tracemalloc during the call, and the size of the returned array. A ratio
+    of 1 means the loader decodes into a single output buffer. Allocations
+    that bypass the Python allocators (e.g. inside torch) are not traced.
+    """
+    if not dataset.audio_files:
+        return []
+    # the first call pays for lazy imports and library initialization
+    dataset.loader_function(dataset.audio_files[0])
+
+    peaks = []
+    sizes = []
+    tracemalloc.start()
+    for fp in dataset.audio_files:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        try:
+            audio = dataset.loader_function(fp)
+        except Exception as e:
+            print(f"[error] file {fp}: {e}")
+            continue
+        _, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - before)
+        sizes.append(np.asarray(audio).nbytes)
+        del audio
+    tracemalloc.stop()
+
+    if not peaks:
+        return []
+    alloc_peak_bytes = float(np.mean(peaks))
+    result_bytes = float(np.mean(sizes))
+    alloc_ratio = alloc_peak_bytes / result_bytes if result_bytes else float('nan')
+    print(f"[Alloc] peak={alloc_peak_bytes / 1024:.1f}KB | result={result_bytes / 1024:.1f}KB | ratio={alloc_ratio:.2f} per call")
+    return [dict(
+        alloc_peak_bytes=alloc_peak_bytes,
+        result_bytes=result_bytes,
+        alloc_ratio=alloc_ratio,
+    )]
+
+
+def bench_batch(dataset, args):
+    """
+    Cost of assembling padded batches and the fraction of padding in them,
+    for plain random batches and for duration-bucketed batches. The dataset
+    mixes all durations up to the cell's duration. Decoding is not timed,
+    only `pad_collate`.
+    """
+    lengths = dataset.lengths()
+    rows = []
+    for batch_size in args.batch_sizes:
+        samplers = {
+            'random': torch.utils.data.BatchSampler(
+                torch.utils.data.RandomSampler(dataset), batch_size, drop_last=False
+            ),
+            'bucket': DurationBucketSampler(lengths, batch_size),
+        }
+        for sampler_name, sampler in samplers.items():
+            samples_ns = []
+            padded = 0
+            total = 0
+            for n, batch in enumerate(sampler):
+                if n >= args.max_batches:
+                    break
+                items = [dataset[index] for index in batch]
+                t0 = time.perf_counter_ns()
+                signals, batch_lengths = pad_collate(items)
+                samples_ns.append(time.perf_counter_ns() - t0)
+                padded += signals.numel()
+                total += int(batch_lengths.sum()) * signals.shape[1]
+            result = timing.summarize(samples_ns)
+            padding_waste = 1.0 - total / padded if padded else float('nan')
+            print(f"[Batch] batch_size={batch_size} | sampler={sampler_name} | collate={result['time']:.6f}s per batch | padding_waste={padding_waste:.2%}")
+            rows.append(dict(
+                batch_size=batch_size,
+                sampler=sampler_name,
+                padding_waste=padding_waste,
+                **result
+            ))
+    return rows
+
+
+def _decode(lib, fp):
+    # module level, so that process pools can pickle it
+    audio = loaders.get_loader(lib).load(fp)
+    return loaders.as_tensor(audio)
+
+
+def bench_concurrency(dataset, args):
+    """
+    Decode all files of the cell concurrently with a thread pool and with a
+    process pool of 1..N workers (the non-zero `--workers`). Speedup and
+    parallel efficiency are relative to decoding the files serially in this
+    process. Backends that release the GIL scale with threads; process pools
+    also pay for sending the decoded tensors back. One timed call is one
+    pass over the files, worker start-up is part of the warmup.
+    """
+    decode = functools.partial(_decode, dataset.lib)
+    files = dataset.audio_files
+    if not files:
+        return []
+
+    def serial(files):
+        for fp in files:
+            decode(fp)
+
+    baseline = timing.measure(serial, [files], **timing.options(args))
+    rows = []
+    executors = {'thread': ThreadPoolExecutor, 'process': ProcessPoolExecutor}
+    for executor_name, executor in executors.items():
+        for workers in [n for n in args.workers if n > 0]:
+            with executor(workers) as pool:
+                def call(files):
+                    for _ in pool.map(decode, files):
+                        pass
+
+                result = timing.measure(call, [files], **timing.options(args))
+            speedup = baseline['time'] / result['time']
+            print(f"[Concurrency] executor={executor_name} | workers={workers} | {len(files) / result['time']:.2f} files/sec | speedup={speedup:.2f} | efficiency={speedup / workers:.2%}")
+            rows.append(dict(
+                executor=executor_name,
+                workers=workers,
+                files_per_sec=len(files) / result['time'],
+                time_serial=baseline['time'],
+                speedup=speedup,
+                efficiency=speedup / workers,
+                **result
+            ))
+    return rows
+
+
+def bench_prefetch(dataset, args):
+    """
+    Decode all files of the cell from their paths, and from in-memory
+    buffers that an asyncio pipeline (`prefetch.iter_prefetched`) reads
+    ahead while the previous files are decoded, for every simulated
+    per-file read latency. One timed call is one pass over the files.
+    """
+    if not loaders.get_loader(dataset.lib).filelike:
+        print("[skip] Loader cannot decode from file-like objects")
+        return []
+
+    def consume(source):
+        audio = dataset.loader_function(source)
+        _ = loaders.as_tensor(audio).max()
+
+    rows = []
+    for latency in args.read_latency:
+        def by_path(files):
+            for fp in files:
+                if latency:
+                    time.sleep(latency)
+                consume(fp)
+
+        def prefetched(files):
+            for _, buffer in prefetch.iter_prefetched(files, args.prefetch_concurrency, latency):
+                consume(buffer)
+
+        baseline = timing.measure(by_path, [dataset.audio_files], **timing.options(args))
+        result = timing.measure(prefetched, [dataset.audio_files], **timing.options(args))
+        speedup = baseline['time'] / result['time']
+        print(f"[Prefetch] latency={latency * 1000:.1f}ms | path={baseline['time']:.6f}s | prefetch={result['time']:.6f}s per pass | speedup={speedup:.2f}")
+        rows.append(dict(
+            read_latency=latency,
+            concurrency=args.prefetch_concurrency,
+            time_path=baseline['time'],
+            speedup=speedup,
+            **result
+        ))
+    return rows
+
+
+def bench_dtype(dataset, args):
+    """
+    Load time and bytes per sample of the tensors returned for every
+    requested `dtype`. Loaders without `native_dtype` return float32 when
+    int16 is requested, which shows up in `out_dtype`.
+    """
+    rows = []
+    for dtype in args.dtypes:
+        load = functools.partial(loaders.get_loader(dataset.lib).load, dtype=dtype)
+        returned = {}
+
+        def call(fp):
+            audio = loaders.as_tensor(load(fp))
+            _ = audio.max()
+            returned['dtype'] = audio.dtype
+            returned['bytes_per_sample'] = audio.element_size()
+
+        result = timing.measure(call, dataset.audio_files, **timing.options(args))
+        if not returned:
+            continue
+        out_dtype = str(returned['dtype']).replace('torch.', '')
+        print(f"[Dtype] dtype={dtype} | returned={out_dtype} | {returned['bytes_per_sample']} bytes/sample | mean={result['time']:.6f}s")
+        rows.append(dict(
+            dtype=dtype,
+            out_dtype=out_dtype,
+            bytes_per_sample=returned['bytes_per_sample'],
+            **result
+        ))
+    return rows
+
+
+MODES = {
+    'time': (bench_time, loaders.PHASE_COLUMNS + timing.COLUMNS),
+    'dataloader': (bench_dataloader, [
+        'num_workers',
+        'prefetch_factor',
+        'persistent_workers',
+        'time',
+        'files_per_sec',
+        'samples_per_sec',
+    ]),
+    'excerpt': (bench_excerpt, [
+        'excerpt_seconds',
+        'position',
+        'offset_seconds',
+    ] + timing.COLUMNS),
+    'coldstart': (bench_coldstart, [
+        'process_time',
+        'torch_import_time',
+        'import_time',
+        'first_call_time',
+        'warm_time',
+    ] + timing.COLUMNS),
+    'cache': (bench_cache, [
+        'cache_bytes',
+        'shared',
+        'hit_rate',
+        'time_uncached',
+        'speedup',
+    ] + timing.COLUMNS),
+    'stream': (bench_stream, [
+        'frames_per_chunk',
+        'samples_per_sec',
+        'baseline_rss_MB',
+        'peak_rss_MB',
+        'peak_rss_delta_MB',
+        'tracemalloc_peak_MB',
+        'children_peak_rss_MB',
+    ] + timing.COLUMNS),
+    'alloc': (bench_alloc, [
+        'alloc_peak_bytes',
+        'result_bytes',
+        'alloc_ratio',
+    ]),
+    'batch': (bench_batch, [
+        'batch_size',
+        'sampler',
+        'padding_waste',
+    ] + timing.COLUMNS),
+    'concurrency': (bench_concurrency, [
+        'executor',
+        'workers',
+        'files_per_sec',
+        'time_serial',
+        'speedup',
+        'efficiency',
+    ] + timing.COLUMNS),
+    'prefetch': (bench_prefetch, [
+        'read_latency',
+        'concurrency',
+        'time_path',
+        'speedup',
+    ] + timing.COLUMNS),
+    'dtype': (bench_dtype, [
+        'dtype',
+        'out_dtype',
+        'bytes_per_sample',
+    ] + timing.COLUMNS),
+}
+
+# options swept or used by every mode besides the timing options; a cell is
+# only skipped if it was run with the same values
+MODE_OPTIONS = {
+    'time': [],
+    'dataloader': ['workers', 'prefetch_factor', 'persistent_workers'],
+    'excerpt': ['excerpt_seconds', 'offsets'],
+    'coldstart': [],
+    'cache': ['cache_bytes', 'cache_dir'],
+    'stream': ['frames_per_chunk'],
+    'alloc': [],
+    'batch': ['batch_sizes', 'max_batches'],
+    'concurrency': ['workers'],
+    'prefetch': ['read_latency', 'prefetch_concurrency'],
+    'dtype': ['dtypes'],
+}
 
-    def __len__(self):
-        return len(self.audio_files)
 
 if __name__ == "__main__":
 
-    parser = argparse.ArgumentParser(description='Process some integers.')
+    parser = argparse.ArgumentParser(description='Benchmark audio loading.')
     parser.add_argument('--ext', type=str, default="wav")
+    parser.add_argument('--root', type=str, default="AUDIO",
+                        help='Corpus directory with one sub-directory per duration in seconds.')
+    manifest.add_arguments(parser)
+    parser.add_argument('--libs', type=str, nargs='+', default=None,
+                        help='Loaders from the registry in loaders.py (default: all installed loaders supporting --ext).')
+    parser.add_argument('--mode', type=str, default="time", choices=sorted(MODES),
+                        help='Benchmark mode: single-process timing loop, DataLoader throughput sweep, excerpt (crop) loading, cold start in a fresh interpreter, decoded-audio cache, chunked streaming, bytes allocated per call, padded batch assembly, thread versus process pool scaling, asynchronous read-ahead or int16 versus float32 output.')
+    parser.add_argument('--frames-per-chunk', type=int, nargs='+', default=[1024, 16384, 262144],
+                        help='Chunk sizes (in frames) to sweep in stream mode.')
+    parser.add_argument('--cache-bytes', type=int, default=2**30,
+                        help='Byte budget of the decoded-audio cache in cache mode.')
+    parser.add_argument('--cache-dir', type=str, default=None,
+                        help='Share the cache between processes through this directory (e.g. /dev/shm/audio_cache).')
+    timing.add_arguments(parser)
+    parser.add_argument('--workers', type=int, nargs='+', default=utils.default_worker_counts(),
+                        help='num_workers values to sweep in dataloader mode, and pool sizes (except 0) in concurrency mode.')
+    parser.add_argument('--prefetch-factor', type=int, nargs='+', default=[2],
+                        help='prefetch_factor values to sweep in dataloader mode.')
+    parser.add_argument('--persistent-workers', type=int, nargs='+', choices=[0, 1], default=[0, 1],
+                        help='persistent_workers values to sweep in dataloader mode.')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[4, 16, 64],
+                        help='Batch sizes to sweep in batch mode.')
+    parser.add_argument('--max-batches', type=int, default=50,
+                        help='Number of batches assembled per batch size and sampler in batch mode.')
+    parser.add_argument('--read-latency', type=float, nargs='+', default=[0.0, 0.005, 0.02],
+                        help='Simulated per-file read latencies (in seconds) to sweep in prefetch mode.')
+    parser.add_argument('--prefetch-concurrency', type=int, default=8,
+                        help='Maximum number of files read ahead in prefetch mode.')
+    parser.add_argument('--dtypes', type=str, nargs='+', default=list(loaders.DTYPES), choices=loaders.DTYPES,
+                        help='Output dtypes to compare in dtype mode.')
+    parser.add_argument('--excerpt-seconds', type=float, default=1.0,
+                        help='Crop length in excerpt mode.')
+    parser.add_argument('--offsets', type=float, nargs='+', default=[0.0, 0.25, 0.5, 0.75, 1.0],
+                        help='Relative crop positions in excerpt mode (0=start, 1=end of file).')
     args = parser.parse_args()
 
-    repeat = 3
+    bench_function, mode_columns = MODES[args.mode]
     columns = [
         'ext',
         'lib',
         'duration',
-        'time',
-    ]
+    ] + mode_columns
 
-    store = utils.DF_writer(columns)
+    if args.mode == 'time':
+        out_path = "results/benchmark_pytorch"
+    else:
+        out_path = f"results/benchmark_pytorch_{args.mode}"
+    config = dict(timing.options(args), **{option: getattr(args, option) for option in MODE_OPTIONS[args.mode]})
+    store = utils.ResultStore(out_path, columns, config=config)
 
-    libs = [
-        'stempeg',
-        'ar_ffmpeg',
-    ]
-    torchaudio_backends = ['torchaudio-ffmpeg', 'torchaudio-streamreader']
-    libs.extend(torchaudio_backends)
+    libs = args.libs or loaders.available_loaders(args.ext)
 
-    if args.ext != "mp4":
-        libs.append('torchaudio-sox_io')
-        libs.append('torchaudio-soundfile')
+    records = manifest.from_args(args)
+    cells = duration_cells(args.root, args.ext, records=records)
 
     for lib in libs:
         print(f"\n===== Testing loader: {lib} =====")
-        if "torchaudio" in lib:
-            backend = lib.split("torchaudio-")[-1]
-            if backend == 'streamreader':
-               call_fun = 'load_torchaudio_streamreader'           
-            else:
-                import torchaudio
-                torchaudio.set_audio_backend(backend)
-                call_fun = "load_torchaudio"
-        else:
-            call_fun = 'load_' + lib
-
-        for root, dirs, _ in sorted(os.walk('AUDIO')):
-            print(f"[os.walk] Root: '{root}' | Subdirs: {dirs}")
-            for audio_dir in dirs:
-                print(f"[Directory] Processing '{audio_dir}' under '{root}'")
-                try:
-                    duration = int(audio_dir)
-                except Exception as e:
-                    print(f"[skip] Cannot parse duration from '{audio_dir}': {e}")
-                    continue
+        for i, (duration, files) in enumerate(cells):
+            cell = dict(ext=args.ext, lib=lib, duration=duration)
+            if store.done(**cell):
+                print(f"[skip] duration={duration}s already in '{out_path}'")
+                continue
+            if args.mode == 'batch':
+                # batches mix all durations up to this one
+                files = [fp for _, cell_files in cells[:i + 1] for fp in cell_files]
+            dataset = AudioFolder(args.root, extension=args.ext, lib=lib, files=files, info=records)
+            print(f"[Dataset] duration={duration}s | Num_files={len(dataset)}")
 
-                folder_path = os.path.join(root, audio_dir)
-                dataset = AudioFolder(folder_path, extension=args.ext, lib=call_fun)
-                loader = torch.utils.data.DataLoader(
-                    dataset,
-                    batch_size=1,
-                    num_workers=0,
-                    shuffle=False
-                )
-                print(f"[DataLoader] Created for duration={duration}s | Num_files={len(dataset)}")
-
-                start = time.time()
-                # iterate per-file to catch load errors
-                for i in range(repeat):
-                    for idx, fp in enumerate(dataset.audio_files):
-                        try:
-                            audio = dataset.loader_function(fp)
-                            _ = torch.as_tensor(audio).view(1,1,-1).max()
-                        except Exception as e:
-                            print(f"[error] Iteration {i}, file {fp}: {e}")
-                end = time.time()
+            store.write(cell, bench_function(dataset, args))
 
-                total_calls = len(dataset) * repeat
-                avg_time = (end - start) / total_calls if total_calls > 0 else float('nan')
-                print(f"[Timing] lib={lib} | duration={duration}s | avg_time={avg_time:.6f}s per file")
-
-                store.append(
-                    ext=args.ext,
-                    lib=lib,
-                    duration=duration,
-                    time=avg_time,
-                )
-
-    out_path = f"results/benchmark_pytorch_{args.ext}.pickle"
-    store.df.to_pickle(out_path)
     print(f"Benchmark results saved to: {out_path}")
-
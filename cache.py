@@ -0,0 +1,120 @@
+"""
+Bounded LRU cache of decoded audio, used by `dataset.AudioFolder` to skip
+re-decoding files in every epoch.
+
+Entries are keyed by path, modification time, loader and dtype, so a changed
+file or a different backend is a miss. By default the cache lives in the memory of
+the process (and therefore per DataLoader worker). With `shared_dir` the
+decoded arrays are written as `.npy` files to a directory that all workers
+can see, ideally on a tmpfs such as `/dev/shm`, and read back memory-mapped.
+"""
+import hashlib
+import os
+import tempfile
+from collections import OrderedDict
+
+import numpy as np
+
+
+class DecodedCache(object):
+    def __init__(self, max_bytes, shared_dir=None):
+        self.max_bytes = max_bytes
+        self.shared_dir = shared_dir
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0
+        self._entries = OrderedDict()
+        if shared_dir is not None:
+            os.makedirs(shared_dir, exist_ok=True)
+
+    @property
+    def hit_rate(self):
+        calls = self.hits + self.misses
+        return self.hits / calls if calls else float('nan')
+
+    def key(self, fp, lib, dtype='float32'):
+        return (os.path.abspath(fp), os.stat(fp).st_mtime_ns, lib, dtype)
+
+    def get(self, key):
+        if self.shared_dir is not None:
+            audio = self._get_shared(key)
+        else:
+            audio = self._entries.get(key)
+            if audio is not None:
+                self._entries.move_to_end(key)
+        if audio is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return audio
+
+    def put(self, key, audio):
+        audio = np.asarray(audio)
+        if audio.nbytes > self.max_bytes:
+            return
+        if self.shared_dir is not None:
+            self._put_shared(key, audio)
+            return
+        if key in self._entries:
+            self.nbytes -= self._entries.pop(key).nbytes
+        self._entries[key] = audio
+        self.nbytes += audio.nbytes
+        while self.nbytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.nbytes -= evicted.nbytes
+
+    def clear(self):
+        self._entries.clear()
+        self.nbytes = 0
+        if self.shared_dir is not None:
+            for name in os.listdir(self.shared_dir):
+                if name.endswith('.npy'):
+                    os.remove(os.path.join(self.shared_dir, name))
+
+    def _path(self, key):
+        digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        return os.path.join(self.shared_dir, digest + '.npy')
+
+    def _get_shared(self, key):
+        path = self._path(key)
+        try:
+            # copy-on-write mapping: no copy, but writable for torch
+            audio = np.load(path, mmap_mode='c')
+        except (OSError, ValueError):
+            return None
+        # the modification time orders the entries for LRU eviction
+        try:
+            os.utime(path)
+        except OSError:
+            # evicted by another worker after mapping it; the mapping stays valid
+            pass
+        return audio
+
+    def _put_shared(self, key, audio):
+        # write to a temporary file first, so that other workers never
+        # read a partially written entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.shared_dir, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, audio)
+        os.replace(tmp_path, self._path(key))
+
+        entries = []
+        for name in os.listdir(self.shared_dir):
+            if not name.endswith('.npy'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.shared_dir, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, name))
+        entries.sort()
+        self.nbytes = sum(size for _, size, _ in entries)
+        for _, size, name in entries:
+            if self.nbytes <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.shared_dir, name))
+            except OSError:
+                # already evicted by another worker
+                pass
+            self.nbytes -= size
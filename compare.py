@@ -0,0 +1,181 @@
+"""
+Performance regression gate.
+
+Compares a new result set to a baseline, cell by cell. A cell is a
+combination of the key columns that both result sets have (by default
+those of `KEYS`, every column that configures a measurement rather than
+measuring it, so that different configurations are never pooled). Per cell, the per-call samples (`samples_ns`, for
+`time`) or else the per-row values of the metric are compared with a
+one-sided Mann-Whitney U test. A cell regresses when the mean got worse by
+more than `--threshold` and the test is significant at `--alpha` (or
+cannot be run, e.g. against an aggregated baseline with one row per cell).
+Cells of the baseline that are missing or empty in the new results (e.g. a
+loader that fails after an upgrade) fail as well, unless `--allow-missing`.
+A key column that is left out of the cells but has several values (e.g.
+`measure` and `workers` of the new results against an aggregated baseline
+that lacks them) is an error, since it would pool different
+configurations: select one value with `--where`, or pool it on purpose
+with `--pool`. The ranked report is written as CSV, and the exit code is 1
+if any cell regressed or failed, so that the script can gate upgrades:
+
+    python compare.py results/baseline results/benchmark --threshold 0.05
+    python compare.py benchmark_pytorch_sorted.csv results/benchmark --keys ext lib \
+        --where measure=memory workers=0 dtype=float32 --pool duration
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from utils import read_results
+
+
+KEYS = [
+    # cells of benchmark.py, benchmark_pytorch.py and benchmark_info.py
+    'ext', 'lib', 'channels', 'sample_rate', 'duration', 'measure', 'workers', 'dtype', 'repeat', 'mode',
+    # the per-row configurations of the modes
+    'num_workers', 'prefetch_factor', 'persistent_workers', 'excerpt_seconds', 'position',
+    'cache_bytes', 'shared', 'frames_per_chunk', 'batch_size', 'sampler', 'executor',
+    'read_latency', 'concurrency', 'crop_seconds', 'resample',
+]
+
+# statuses that fail the gate (the missing ones only without --allow-missing)
+FAILED = ('regression', 'missing in current', 'no data in current')
+
+
+def where(df, conditions):
+    """The rows of `df` whose columns equal the `column=value` `conditions` (columns it lacks are ignored)."""
+    for condition in conditions:
+        column, value = condition.split('=', 1)
+        if column not in df:
+            continue
+        if pd.api.types.is_bool_dtype(df[column]):
+            mask = df[column] == (value.lower() in ('1', 'true'))
+        elif pd.api.types.is_numeric_dtype(df[column]):
+            mask = df[column] == float(value)
+        else:
+            mask = df[column].astype(str) == value
+        df = df[mask]
+    return df
+
+
+def pooled(keys, *dfs):
+    """The columns of `KEYS` outside of `keys` with more than one value in any of `dfs`."""
+    return [
+        key for key in KEYS
+        if key not in keys and any(key in df and df[key].nunique(dropna=False) > 1 for df in dfs)
+    ]
+
+
+def samples(df, metric, per_call):
+    if per_call:
+        return np.concatenate([np.asarray(s, dtype=np.float64) for s in df['samples_ns']]) / 1e9
+    return df[metric].dropna().to_numpy(dtype=np.float64)
+
+
+def cells(df, keys):
+    """The rows of `df` by cell, a tuple of the values of `keys`."""
+    # configurations without a value (e.g. prefetch_factor without workers)
+    # are cells too, with None for NaN so that they match across result sets
+    return {
+        tuple(None if pd.isna(value) else value for value in (key if isinstance(key, tuple) else (key,))): group
+        for key, group in df.groupby(keys, dropna=False)
+    }
+
+
+def compare(baseline, current, keys, metric='time', threshold=0.05, alpha=0.05,
+            higher_is_better=False):
+    """Ranked DataFrame with one row per cell, the worst change first."""
+    # the raw per-call samples are only comparable if both sides have them
+    per_call = metric == 'time' and 'samples_ns' in baseline and 'samples_ns' in current
+    baseline_cells = cells(baseline, keys)
+    current_cells = cells(current, keys)
+    rows = []
+    for key in sorted(set(baseline_cells) | set(current_cells), key=str):
+        row = dict(zip(keys, key))
+        if key not in baseline_cells or key not in current_cells:
+            row.update(status='missing in ' + ('baseline' if key not in baseline_cells else 'current'))
+            rows.append(row)
+            continue
+        before = samples(baseline_cells[key], metric, per_call)
+        after = samples(current_cells[key], metric, per_call)
+        if not len(before) or not len(after):
+            row.update(status='no data in ' + ('current' if not len(after) else 'baseline'))
+            rows.append(row)
+            continue
+        change = after.mean() / before.mean() - 1
+        worse = -change if higher_is_better else change
+        p_value = float('nan')
+        if len(before) > 1 and len(after) > 1:
+            # one-sided, in the direction of the observed change
+            _, p_value = stats.mannwhitneyu(
+                after, before, alternative='greater' if change > 0 else 'less'
+            )
+        significant = np.isnan(p_value) or p_value < alpha
+        if worse > threshold and significant:
+            status = 'regression'
+        elif worse < -threshold and significant:
+            status = 'improvement'
+        else:
+            status = 'unchanged'
+        row.update(
+            baseline=before.mean(),
+            current=after.mean(),
+            change=change,
+            p_value=p_value,
+            n_baseline=len(before),
+            n_current=len(after),
+            status=status,
+            worse=worse,
+        )
+        rows.append(row)
+    report = pd.DataFrame(rows)
+    if 'worse' in report:
+        report = report.sort_values('worse', ascending=False, na_position='last').drop(columns='worse')
+    return report.reset_index(drop=True)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Compare benchmark results to a baseline and fail on regressions.')
+    parser.add_argument('baseline', type=str, help='Baseline results (result store directory, CSV, pickle or Parquet).')
+    parser.add_argument('current', type=str, help='New results, in the same formats.')
+    parser.add_argument('--metric', type=str, default='time')
+    parser.add_argument('--higher-is-better', action='store_true',
+                        help='The metric is a throughput (e.g. files_per_sec) rather than a cost.')
+    parser.add_argument('--keys', type=str, nargs='+', default=None,
+                        help='Columns that identify a cell (default: the columns of %s in both result sets).' % ', '.join(KEYS))
+    parser.add_argument('--where', type=str, nargs='+', default=[], metavar='COLUMN=VALUE',
+                        help='Only compare the rows with these values, e.g. measure=memory workers=0.')
+    parser.add_argument('--pool', type=str, nargs='+', default=[],
+                        help='Key columns whose values may be pooled into one cell, e.g. duration.')
+    parser.add_argument('--threshold', type=float, default=0.05,
+                        help='Relative change of the mean above which a cell regresses.')
+    parser.add_argument('--alpha', type=float, default=0.05,
+                        help='Significance level of the Mann-Whitney U test.')
+    parser.add_argument('--allow-missing', action='store_true',
+                        help='Do not fail on baseline cells that are missing or empty in the new results.')
+    parser.add_argument('--report', type=str, default='results/regression_report.csv')
+    args = parser.parse_args()
+
+    baseline = where(read_results(args.baseline), args.where)
+    current = where(read_results(args.current), args.where)
+    keys = args.keys or [key for key in KEYS if key in baseline and key in current]
+    mixed = [key for key in pooled(keys, baseline, current) if key not in args.pool]
+    if mixed:
+        parser.error(f"{', '.join(mixed)} would be pooled into the cells of {', '.join(keys)}; "
+                     f"add them to --keys, select one value with --where or allow pooling with --pool")
+    report = compare(baseline, current, keys, metric=args.metric, threshold=args.threshold,
+                     alpha=args.alpha, higher_is_better=args.higher_is_better)
+    os.makedirs(os.path.dirname(args.report) or '.', exist_ok=True)
+    report.to_csv(args.report, index=False)
+
+    print(report.to_string(index=False))
+    counts = report['status'].value_counts()
+    missing = counts.get('missing in current', 0) + counts.get('no data in current', 0)
+    failed = [status for status in FAILED if not (args.allow_missing and status != 'regression')]
+    print(f"\n[Compare] {counts.get('regression', 0)} regressions | {missing} missing in current | {counts.get('improvement', 0)} improvements | {counts.get('unchanged', 0)} unchanged | {len(report)} cells | report saved to: {args.report}")
+    sys.exit(1 if report['status'].isin(failed).any() else 0)
@@ -1,20 +1,27 @@
-import pandas as pd
+import argparse
 
-dfs = []
+from utils import read_results
 
-# Iterate over different file extensions
-for ext in ["wav", "mp3", "mp4", "ogg", "flac"]:
-    try:
-        # Read each pickle file and append to the list
-        dfs.append(pd.read_pickle(f"results/benchmark_pytorch_{ext}.pickle"))
-    except FileNotFoundError:
-        continue
+parser = argparse.ArgumentParser(description='Rank the loaders of a benchmark.py result set.')
+parser.add_argument('--results', type=str, default='results/benchmark')
+parser.add_argument('--measure', type=str, default='memory', choices=['memory', 'training'],
+                    help='Rank by the mean time per file in-process, or by the sustained samples/sec of the training measure.')
+parser.add_argument('--workers', type=int, default=None,
+                    help='DataLoader workers of the ranked cells (default: 0 for memory, the largest for training).')
+args = parser.parse_args()
 
-df = pd.concat(dfs, ignore_index=True)
+df = read_results(args.results)
+df = df[(df['measure'] == args.measure) & (df['dtype'] == 'float32')]
+workers = args.workers
+if workers is None:
+    workers = 0 if args.measure == 'memory' else df['workers'].max()
+df = df[df['workers'] == workers]
 
-grouped_df = df.groupby(['ext', 'lib']).mean().reset_index()
+grouped_df = df.groupby(['ext', 'lib']).mean(numeric_only=True).reset_index()
 
-sorted_df = grouped_df.sort_values(by='time')
+if args.measure == 'training':
+    sorted_df = grouped_df.sort_values(by='samples_per_sec', ascending=False)
+else:
+    sorted_df = grouped_df.sort_values(by='time')
 
 sorted_df.to_csv("results/benchmark_pytorch_sorted.csv", index=False)
-
@@ -0,0 +1,260 @@
+import functools
+import math
+import os
+import os.path
+
+import numpy as np
+import scipy.signal
+import torch
+import torch.utils.data
+
+import loaders
+import manifest
+# the corpus listing lives in manifest.py, which does not import torch
+from manifest import duration_cells, get_files
+
+
+def probe_frames(files):
+    """Number of samples (frames times channels) of every file, from its metadata."""
+    lengths = []
+    for fp in files:
+        info = manifest.probe(fp)
+        lengths.append(info['samples'] * info['channels'])
+    return lengths
+
+
+class AudioFolder(torch.utils.data.Dataset):
+    """
+    All files with `extension` under `root`, decoded with the registered
+    loader `lib`. An optional `cache.DecodedCache` keeps decoded audio
+    across epochs. Pass `files` to use a given list of files instead of
+    searching `root`, and the `info` records of a `manifest.load` to take
+    the files and their metadata from the manifest. `dtype` is passed to
+    the loader (see `loaders.DTYPES`). With `phases`, items are
+    `(audio, phase_ns)`, with the nanoseconds the item spent in each of
+    `loaders.PHASES`, so that the phases can be collected from DataLoader
+    worker processes.
+    """
+
+    def __init__(
+        self,
+        root,
+        extension='wav',
+        lib="librosa",
+        cache=None,
+        files=None,
+        info=None,
+        dtype='float32',
+        phases=False,
+    ):
+        self.root = os.path.expanduser(root)
+        self.data = []
+        self.info = info
+        if files is None and info is not None:
+            prefix = os.path.join(os.path.abspath(self.root), '')
+            files = [fp for fp, record in info.items()
+                     if record['ext'] == extension and fp.startswith(prefix)]
+        elif files is None:
+            files = get_files(self.root, extension)
+        self.audio_files = list(files)
+        print(f"[AudioFolder] Loader='{lib}' | Directory='{self.root}' | Files={len(self.audio_files)}")
+        self.lib = lib
+        loader = loaders.get_loader(lib)
+        self.dtype = dtype
+        self.loader_function = functools.partial(loader.load, dtype=dtype)
+        self.excerpt_function = loader.excerpt
+        if self.excerpt_function is not None:
+            self.excerpt_function = functools.partial(self.excerpt_function, dtype=dtype)
+        self.cache = cache
+        self.phases = phases
+
+    def lengths(self):
+        """Number of samples of every file, from the manifest if there is one."""
+        if self.info is None:
+            return probe_frames(self.audio_files)
+        return [self.info[fp]['samples'] * self.info[fp]['channels'] for fp in self.audio_files]
+
+    def file_sizes(self):
+        if self.info is None:
+            return [os.path.getsize(fp) for fp in self.audio_files]
+        return [self.info[fp]['size'] for fp in self.audio_files]
+
+    def load(self, fp):
+        try:
+            return self.loader_function(fp)
+        except Exception as e:
+            print(f"[error] Loading '{fp}' with loader '{self.lib}': {e}")
+            raise
+
+    def __getitem__(self, index):
+        fp = self.audio_files[index]
+        if self.phases:
+            start = loaders.phase_ns()
+        if self.cache is None:
+            audio = self.load(fp)
+        else:
+            key = self.cache.key(fp, self.lib, self.dtype)
+            audio = self.cache.get(key)
+            if audio is None:
+                audio = np.asarray(self.load(fp))
+                self.cache.put(key, audio)
+        audio = loaders.as_tensor(audio)
+        if self.phases:
+            end = loaders.phase_ns()
+            return audio, {phase: end[phase] - start[phase] for phase in loaders.PHASES}
+        return audio
+
+    def __len__(self):
+        return len(self.audio_files)
+
+
+class RandomCrops(AudioFolder):
+    """
+    Training-style items: a random crop of `crop_seconds` from every file,
+    resampled to `sample_rate` (if given) and zero-padded to a fixed length,
+    so that the `(channels, frames)` items stack into batches. Loaders with
+    an excerpt variant only decode the crop, the others decode the whole
+    file. The crops have the `dtype` the loader returns (see
+    `loaders.DTYPES`), also when resampled. Items are keyed by `(index,
+    epoch)` (see `EpochSampler`) and the crop offset is drawn from a
+    generator seeded with `(seed, epoch, index)`, so that the crops are the
+    same with any number of workers.
+    """
+
+    def __init__(self, root, crop_seconds=1.0, sample_rate=None, seed=0, **kwargs):
+        super(RandomCrops, self).__init__(root, **kwargs)
+        self.crop_seconds = crop_seconds
+        self.sample_rate = sample_rate
+        self.seed = seed
+        if self.info is None:
+            metadata = [manifest.probe(fp) for fp in self.audio_files]
+        else:
+            metadata = [self.info[fp] for fp in self.audio_files]
+        self.frames = [int(record['samples']) for record in metadata]
+        self.rates = [int(record['sampling_rate']) for record in metadata]
+
+    def crop(self, fp, offset, num_frames):
+        try:
+            if self.excerpt_function is not None:
+                audio = self.excerpt_function(fp, offset, num_frames)
+            else:
+                audio = self.loader_function(fp)[..., offset:offset + num_frames]
+        except Exception as e:
+            print(f"[error] Cropping '{fp}' with loader '{self.lib}': {e}")
+            raise
+        # stems of stempeg are stacked along the channels
+        audio = np.asarray(audio)
+        return audio.reshape(-1, audio.shape[-1])
+
+    def __getitem__(self, key):
+        index, epoch = key if isinstance(key, tuple) else (key, 0)
+        fp = self.audio_files[index]
+        rate = self.rates[index]
+        num_frames = int(round(self.crop_seconds * rate))
+        rng = np.random.default_rng((self.seed, epoch, index))
+        offset = int(rng.integers(0, max(self.frames[index] - num_frames, 0) + 1))
+        audio = self.crop(fp, offset, num_frames)
+        target_rate = self.sample_rate or rate
+        if target_rate != rate:
+            factor = math.gcd(target_rate, rate)
+            resampled = scipy.signal.resample_poly(audio, target_rate // factor, rate // factor, axis=-1)
+            if audio.dtype.kind == 'i':
+                limits = np.iinfo(audio.dtype)
+                resampled = np.clip(np.rint(resampled), limits.min, limits.max)
+            audio = resampled.astype(audio.dtype)
+        length = int(round(self.crop_seconds * target_rate))
+        out = np.zeros((audio.shape[0], length), dtype=audio.dtype)
+        out[:, :min(length, audio.shape[-1])] = audio[:, :length]
+        return loaders.as_tensor(out)[0]
+
+
+class EpochSampler(torch.utils.data.Sampler):
+    """
+    Every index once per epoch, shuffled with a generator seeded with
+    `(seed, epoch)`, as the `(index, epoch)` keys of `RandomCrops`.
+    """
+
+    def __init__(self, n, shuffle=True, seed=0):
+        self.n = n
+        self.shuffle = shuffle
+        self.seed = seed
+        self.epoch = 0
+
+    def set_epoch(self, epoch):
+        self.epoch = epoch
+
+    def __iter__(self):
+        indices = np.arange(self.n)
+        if self.shuffle:
+            np.random.default_rng((self.seed, self.epoch)).shuffle(indices)
+        return iter([(int(index), self.epoch) for index in indices])
+
+    def __len__(self):
+        return self.n
+
+
+class DurationBucketSampler(torch.utils.data.Sampler):
+    """
+    Batch sampler that groups files of similar length, to minimize padding.
+
+    The indices are shuffled, sorted by length within pools of
+    `bucket_batches` batches, cut into batches, and the batches are shuffled
+    again, so that epochs differ while every batch spans a narrow range of
+    lengths. `lengths` come from the file metadata (see `probe_frames`).
+    """
+
+    def __init__(self, lengths, batch_size, bucket_batches=100, shuffle=True,
+                 drop_last=False, seed=0):
+        self.lengths = list(lengths)
+        self.batch_size = batch_size
+        self.bucket_batches = bucket_batches
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.seed = seed
+        self.epoch = 0
+
+    def set_epoch(self, epoch):
+        self.epoch = epoch
+
+    def __iter__(self):
+        rng = np.random.default_rng(self.seed + self.epoch)
+        indices = np.arange(len(self.lengths))
+        if self.shuffle:
+            rng.shuffle(indices)
+        pool_size = self.batch_size * self.bucket_batches
+        batches = []
+        for start in range(0, len(indices), pool_size):
+            pool = sorted(indices[start:start + pool_size], key=self.lengths.__getitem__)
+            for i in range(0, len(pool), self.batch_size):
+                batch = [int(index) for index in pool[i:i + self.batch_size]]
+                if len(batch) < self.batch_size and self.drop_last:
+                    continue
+                batches.append(batch)
+        if self.shuffle:
+            rng.shuffle(batches)
+        return iter(batches)
+
+    def __len__(self):
+        if self.drop_last:
+            return len(self.lengths) // self.batch_size
+        return (len(self.lengths) + self.batch_size - 1) // self.batch_size
+
+
+def pad_collate(items):
+    """
+    Collate `AudioFolder` items of different lengths (with the same number
+    of channels) into one preallocated `(batch, channels, max_length)`
+    tensor, padded with zeros, and the vector of the original lengths in
+    frames.
+    """
+    signals = [item.reshape(-1, item.shape[-1]) for item in items]
+    lengths = torch.tensor([signal.shape[-1] for signal in signals], dtype=torch.int64)
+    max_length = int(lengths.max()) if len(signals) else 0
+    dtype = signals[0].dtype if signals else torch.float32
+    channels = signals[0].shape[0] if signals else 1
+    batch = torch.empty((len(signals), channels, max_length), dtype=dtype)
+    for i, signal in enumerate(signals):
+        batch[i, :, :signal.shape[-1]] = signal
+        # only the padding is zeroed, the rest is overwritten anyway
+        batch[i, :, signal.shape[-1]:] = 0
+    return batch, lengths
@@ -0,0 +1,260 @@
+"""
+Deterministic, parallel generator of the benchmark corpus.
+
+Writes `--files` white-noise files for every duration into
+`<root>/<duration>/<i>.<ext>`, as generate_audio.sh did with sox and
+ffmpeg: the noise is written as PCM WAV with soundfile and encoded to the
+other formats with ffmpeg (or soundfile, for the formats it can write, if
+ffmpeg is not installed). Every file is generated by its own task in a
+process pool, from a random generator seeded with `(seed, duration, i)`, so
+the same options always produce the same files, independent of the number
+of workers (with soundfile, Ogg streams get random serial numbers, so only
+their samples are reproducible). Formats whose encoder cannot take the
+channel count or sample rate (e.g. mp3 beyond 2 channels or 48 kHz) are
+skipped with a warning, as are the formats soundfile cannot write when
+ffmpeg is not installed. The options that change the signal are
+stored in `<root>/corpus.json` once all files were generated without
+errors; files that already exist for the same options are kept, all others
+are (re)generated. Without a `corpus.json` (e.g. after an interrupted run),
+all files are regenerated.
+
+    python generate_audio.py --root AUDIO --durations $(seq 1 10 151) --files 10
+    python generate_audio.py --root AUDIO_8CH --channels 8 --sample-rate 96000 --bit-depth 24 --bitrate 320k
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import soundfile as sf
+
+import loaders
+
+
+DEFAULTS = dict(
+    durations=list(range(1, 152, 10)),
+    files=10,
+    formats=list(loaders.FFMPEG_FORMATS),
+    channels=1,
+    sample_rate=44100,
+    bit_depth=16,
+    bitrate=None,
+    seed=0,
+)
+
+# the options that change the content of a file
+SIGNAL = ('channels', 'sample_rate', 'bit_depth', 'bitrate', 'seed')
+
+SUBTYPES = {8: 'PCM_U8', 16: 'PCM_16', 24: 'PCM_24', 32: 'PCM_32'}
+
+# formats soundfile encodes when ffmpeg is not installed
+SOUNDFILE_FORMATS = {'flac': 'FLAC', 'ogg': 'OGG', 'mp3': 'MP3'}
+
+BLOCK = 1 << 20
+
+# the largest channel count and the sample rates of the encoders; formats without
+# `sample_rates` take any rate
+MP3_SAMPLE_RATES = (8000, 11025, 12000, 16000, 22050, 24000, 32000, 44100, 48000)
+AAC_SAMPLE_RATES = (7350, 8000, 11025, 12000, 16000, 22050, 24000, 32000, 44100, 48000, 64000, 88200, 96000)
+LIMITS = {
+    'mp3': dict(channels=2, sample_rates=MP3_SAMPLE_RATES),
+    'mp4': dict(channels=8, sample_rates=AAC_SAMPLE_RATES),
+    'ogg': dict(channels=8),
+    'flac': dict(channels=8),
+}
+
+
+def unsupported(ext, channels=1, sample_rate=44100):
+    """Why `ext` cannot be encoded with `channels` at `sample_rate`, or None."""
+    if ext != 'wav' and ext not in SOUNDFILE_FORMATS and not shutil.which('ffmpeg'):
+        return "ffmpeg is required"
+    limits = LIMITS.get(ext, {})
+    if channels > limits.get('channels', channels):
+        return f"at most {limits['channels']} channels"
+    if sample_rate not in limits.get('sample_rates', (sample_rate,)):
+        return f"{sample_rate} Hz is not one of {', '.join(map(str, limits['sample_rates']))}"
+    return None
+
+
+def noise(duration, index, channels=1, sample_rate=44100, seed=0, block=BLOCK):
+    """
+    Yield blocks of `(frames, channels)` float32 white noise at half
+    scale with one second fade in and out (`sox ... whitenoise vol 0.5 fade
+    q 1`), so that hour-long files never have to be held in memory.
+    """
+    rng = np.random.default_rng((seed, duration, index))
+    frames = int(duration * sample_rate)
+    fade = max(1, min(sample_rate, frames // 2))
+    for start in range(0, frames, block):
+        n = min(block, frames - start)
+        samples = rng.uniform(-0.5, 0.5, size=(n, channels)).astype(np.float32)
+        pos = np.arange(start, start + n)
+        # quarter sine fades
+        gain = np.sin(0.5 * np.pi * np.minimum(1.0, np.minimum(pos, frames - 1 - pos) / fade))
+        samples *= gain.astype(np.float32)[:, None]
+        yield samples
+
+
+def write_wav(fp, duration, index, channels=1, sample_rate=44100, bit_depth=16, seed=0):
+    with sf.SoundFile(fp, 'w', samplerate=sample_rate, channels=channels,
+                      subtype=SUBTYPES[bit_depth], format='WAV') as f:
+        for samples in noise(duration, index, channels=channels, sample_rate=sample_rate, seed=seed):
+            f.write(samples)
+
+
+def encode(wav, fp, ext, bitrate=None):
+    """Encode `wav` to `fp`, bit-exact and without metadata, so that the output is reproducible."""
+    if shutil.which('ffmpeg'):
+        cmd = ['ffmpeg', '-y', '-v', 'error', '-i', wav, '-map_metadata', '-1',
+               '-fflags', '+bitexact', '-flags:a', '+bitexact']
+        if ext == 'mp4':
+            cmd += ['-strict', '-2']
+        if bitrate and ext != 'flac':
+            cmd += ['-b:a', bitrate]
+        subprocess.run(cmd + [fp], check=True)
+    elif ext in SOUNDFILE_FORMATS:
+        audio, sample_rate = sf.read(wav, dtype='float32')
+        sf.write(fp, audio, sample_rate, format=SOUNDFILE_FORMATS[ext])
+    else:
+        raise RuntimeError(f"ffmpeg is required to encode '{ext}'")
+
+
+def generate_file(root, duration, index, formats, force=False, channels=1, sample_rate=44100,
+                  bit_depth=16, bitrate=None, seed=0):
+    """
+    Write the missing (or, with `force`, all) `formats` of file `index` of
+    `duration`; `(written, failed)`, the number of files written and the
+    formats that failed, after trying all of them.
+    """
+    directory = os.path.join(root, f"{duration:02d}")
+    os.makedirs(directory, exist_ok=True)
+    missing = [ext for ext in formats if force or not os.path.exists(os.path.join(directory, f"{index}.{ext}"))]
+    if not missing:
+        return 0, []
+    # hidden temporary files, so that an interrupted run leaves no partial files behind
+    wav = os.path.join(directory, f".{index}.src.wav")
+    write_wav(wav, duration, index, channels=channels, sample_rate=sample_rate,
+              bit_depth=bit_depth, seed=seed)
+    written = 0
+    failed = []
+    for ext in missing:
+        fp = os.path.join(directory, f"{index}.{ext}")
+        tmp = os.path.join(directory, f".{index}.tmp.{ext}")
+        try:
+            if ext == 'wav':
+                shutil.copyfile(wav, tmp)
+            else:
+                encode(wav, tmp, ext, bitrate=bitrate)
+            os.replace(tmp, fp)
+            written += 1
+        except Exception as e:
+            print(f"[error] Generating '{fp}': {e}")
+            failed.append(ext)
+            if os.path.exists(tmp):
+                os.remove(tmp)
+    os.remove(wav)
+    return written, failed
+
+
+def generate(root, workers=None, force=False, **config):
+    """
+    Generate the corpus described by `config` (see `DEFAULTS`) under
+    `root`. Formats that cannot encode the channel count or sample rate are
+    skipped. Existing files are kept unless `force` is set or the signal
+    options differ from the ones stored in `corpus.json` (or it is missing).
+    `corpus.json` is removed before regenerating and only written once every
+    file was generated, so that an interrupted or failed run is never taken
+    for an up-to-date corpus. Returns the number of files written.
+    """
+    config = dict(DEFAULTS, **{key: value for key, value in config.items() if value is not None})
+    signal = {key: config[key] for key in SIGNAL}
+    formats = []
+    for ext in config['formats']:
+        reason = unsupported(ext, channels=config['channels'], sample_rate=config['sample_rate'])
+        if reason:
+            print(f"[skip] Format '{ext}' in '{root}': {reason}")
+        else:
+            formats.append(ext)
+    spec = os.path.join(root, 'corpus.json')
+    if not force and os.path.exists(spec):
+        with open(spec) as f:
+            force = json.load(f) != signal
+        if force:
+            print(f"[Corpus] Options changed, regenerating '{root}'")
+    elif not force:
+        # files of unknown options
+        force = True
+    os.makedirs(root, exist_ok=True)
+    if force and os.path.exists(spec):
+        os.remove(spec)
+
+    with ProcessPoolExecutor(workers) as pool:
+        futures = [
+            pool.submit(generate_file, root, duration, index, formats, force=force, **signal)
+            for duration in config['durations']
+            for index in range(1, config['files'] + 1)
+        ]
+        written = 0
+        errors = 0
+        for future in futures:
+            try:
+                file_written, failed = future.result()
+            except Exception as e:
+                print(f"[error] Generating corpus: {e}")
+                errors += 1
+                continue
+            written += file_written
+            errors += bool(failed)
+    if errors:
+        print(f"[Corpus] {errors} of {len(futures)} files failed" +
+              (f", '{spec}' not written, the next run regenerates '{root}'" if force else ''))
+    else:
+        tmp = spec + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(signal, f, indent=4)
+        os.replace(tmp, spec)
+    print(f"[Corpus] {written} files written to '{root}' | {len(config['durations'])} durations x {config['files']} files x {len(formats)} formats")
+    return written
+
+
+def add_arguments(parser, sweep=False):
+    """Signal options; with `sweep`, several channel counts and sample rates can be given."""
+    nargs = '+' if sweep else None
+    parser.add_argument('--channels', type=int, nargs=nargs, default=None)
+    parser.add_argument('--sample-rate', type=int, nargs=nargs, default=None)
+    parser.add_argument('--bit-depth', type=int, default=None, choices=sorted(SUBTYPES),
+                        help='Bit depth of the WAV files (default: %d).' % DEFAULTS['bit_depth'])
+    parser.add_argument('--bitrate', type=str, default=None,
+                        help="Bitrate of the lossy codecs, e.g. '128k' (default: ffmpeg's).")
+    parser.add_argument('--seed', type=int, default=None)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Generate the white-noise benchmark corpus.')
+    parser.add_argument('--root', type=str, default='AUDIO')
+    parser.add_argument('--durations', type=int, nargs='+', default=None,
+                        help='Durations in seconds, as for benchmark.py (default: 1, 11, ..., 151).')
+    parser.add_argument('--files', type=int, default=None, help='Files per duration.')
+    parser.add_argument('--formats', type=str, nargs='+', default=None)
+    parser.add_argument('--workers', type=int, default=None, help='Encoding processes (default: one per CPU).')
+    parser.add_argument('--force', action='store_true', help='Regenerate all files.')
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    generate(
+        args.root,
+        workers=args.workers,
+        force=args.force,
+        durations=args.durations,
+        files=args.files,
+        formats=args.formats,
+        channels=args.channels,
+        sample_rate=args.sample_rate,
+        bit_depth=args.bit_depth,
+        bitrate=args.bitrate,
+        seed=args.seed,
+    )
@@ -1,12 +1,18 @@
 import pandas as pd
 
-# Load the benchmarking pickle file containing the results
-benchmark_file_path = "/Users/Divya/torchaudio_benchmarking/results/benchmark_pytorch_wav.pickle"
-benchmark_data = pd.read_pickle(benchmark_file_path)
+from utils import read_results
+
+# Load the benchmarking results of benchmark.py
+benchmark_data = read_results("results/benchmark")
+# in-process loading with the default dtype, as in plot.py
+benchmark_data = benchmark_data[
+    (benchmark_data.ext == 'wav') & (benchmark_data.measure == 'memory')
+    & (benchmark_data.workers == 0) & (benchmark_data.dtype == 'float32')
+]
 
 # Assuming the structure of the benchmark data from your previous script is similar to this:
-# 'total_file_size_KB', 'time' as columns (modify this part if necessary)
-sizes_kb = benchmark_data['total_file_size_KB'].tolist()
+# 'file_size_KB', 'time' as columns (modify this part if necessary)
+sizes_kb = benchmark_data['file_size_KB'].tolist()
 times_ns = benchmark_data['time'].tolist()
 libs = benchmark_data['lib'].tolist()
 
@@ -1,156 +1,577 @@
-from scipy.io import wavfile
-import audioread.rawread
-import audioread.ffdec
-import matplotlib.pyplot as plt
-import soundfile as sf
-import torch
-import aubio
-from pydub import AudioSegment
-import torchaudio
-from torchaudio.io import StreamReader
+import functools
+import importlib
+import importlib.util
+import os
+import time
+from collections import OrderedDict
+
 import numpy as np
-import librosa
-import stempeg
 
 
 """
 Some of the code taken from: 
 https://github.com/aubio/aubio/blob/master/python/demos/demo_reading_speed.py
+
+Backends are imported inside the loader functions, so that importing this
+module (e.g. in every DataLoader worker) only pays for numpy and a missing
+library only breaks its own loaders. Use the `LOADERS` registry at the end
+of this module to pick loaders by name, format and capability.
+
+All load, excerpt and stream functions return channels-first audio,
+`(channels, frames)` (`(stems, channels, frames)` for stem files with
+stempeg), also for mono files, as a C-contiguous array or tensor (excerpts
+of the sample store are views). Backends that decode interleaved samples
+pay for the transposition.
+
+The load functions and `as_tensor` add the time they spend in each of the
+`PHASES` to per-process counters (see `phase_times`): opening the file and
+probing its metadata, decoding, dtype/scale/layout conversion and tensor
+creation. Backends that open, decode and convert in a single call
+(torchaudio, scipy, pydub, soxbindings, librosa, tensorflow-io) count all
+of it as decoding, their open time is 0.
 """
 
-# Guard TF imports
-try:
-    import tensorflow as tf
-    import tensorflow_io as tfio
-except ImportError:
-    tf = None
-    tfio = None
-
-# Only define these if tf was successfully imported
-if tf is not None:
-    @tf.function
-    def load_tfio_fromffmpeg(fp):
-        audio = tfio.IOTensor.graph(tf.int16).from_ffmpeg(fp)
-        return tf.cast(audio.to_tensor(), tf.float32) / 32767.0
-
-    @tf.function
-    def load_tfio_fromaudio(fp, ext="wav"):
-        if ext in ["wav", "flac", "mp4"]:
-            audio = tfio.IOTensor.graph(tf.float16).from_audio(fp)
-            return tf.cast(audio.to_tensor(), tf.float16)
-        else:
-            return tfio.IOTensor.graph(tf.float32).from_audio(fp).to_tensor()
-
-    @tf.function
-    def load_tf_decode_wav(fp, ext="wav", rate=44100):
-        audio, rate = tf.audio.decode_wav(tf.io.read_file(fp))
-        return tf.cast(audio, tf.float32)
-
-
-def load_aubio(fp):
+PHASES = ('open', 'decode', 'convert', 'tensorize')
+PHASE_COLUMNS = [f'{phase}_time' for phase in PHASES]
+
+_phase_ns = dict.fromkeys(PHASES, 0)
+
+
+def _tick(phase, start):
+    """Add the time since `start` to `phase` and return the current time, the start of the next phase."""
+    now = time.perf_counter_ns()
+    _phase_ns[phase] += now - start
+    return now
+
+
+def phase_ns():
+    """Nanoseconds spent in every phase by this process so far."""
+    return dict(_phase_ns)
+
+
+def reset_phases():
+    for phase in PHASES:
+        _phase_ns[phase] = 0
+
+
+def phase_times(calls, phase_ns=None):
+    """
+    Mean seconds per call in every phase since `reset_phases` (or of the
+    given `phase_ns` totals), as `PHASE_COLUMNS`.
+    """
+    phase_ns = phase_ns or _phase_ns
+    return {
+        f'{phase}_time': phase_ns[phase] / calls / 1e9 if calls else float('nan')
+        for phase in PHASES
+    }
+
+
+_TF_FUNCTIONS = {}
+
+
+def _tf_function(name):
+    # tensorflow is only imported (and the graphs traced) on first use
+    if not _TF_FUNCTIONS:
+        import tensorflow as tf
+        import tensorflow_io as tfio
+
+        @tf.function
+        def tfio_fromffmpeg(fp, scale=True):
+            audio = tf.transpose(tfio.IOTensor.graph(tf.int16).from_ffmpeg(fp).to_tensor())
+            if not scale:
+                return audio
+            return tf.cast(audio, tf.float32) / 32767.0
+
+        @tf.function
+        def tfio_fromaudio(fp, ext="wav", dtype="float32"):
+            if ext == "wav" and dtype == "int16":
+                return tf.transpose(tfio.IOTensor.graph(tf.int16).from_audio(fp).to_tensor())
+            if ext in ["wav", "flac", "mp4"]:
+                audio = tfio.IOTensor.graph(tf.float16).from_audio(fp)
+                return tf.transpose(tf.cast(audio.to_tensor(), tf.float32))
+            else:
+                return tf.transpose(tfio.IOTensor.graph(tf.float32).from_audio(fp).to_tensor())
+
+        @tf.function
+        def tf_decode_wav(fp, ext="wav", rate=44100):
+            audio, rate = tf.audio.decode_wav(tf.io.read_file(fp))
+            return tf.transpose(tf.cast(audio, tf.float32))
+
+        _TF_FUNCTIONS.update(
+            tfio_fromffmpeg=tfio_fromffmpeg,
+            tfio_fromaudio=tfio_fromaudio,
+            tf_decode_wav=tf_decode_wav,
+        )
+    return _TF_FUNCTIONS[name]
+
+
+def load_tfio_fromffmpeg(fp, dtype='float32'):
+    t = time.perf_counter_ns()
+    # the graph reads, decodes and converts
+    sig = _tf_function('tfio_fromffmpeg')(fp, dtype != 'int16')
+    _tick('decode', t)
+    return sig
+
+
+def load_tfio_fromaudio(fp, ext="wav", dtype='float32'):
+    t = time.perf_counter_ns()
+    sig = _tf_function('tfio_fromaudio')(fp, ext, dtype)
+    _tick('decode', t)
+    return sig
+
+
+def load_tf_decode_wav(fp, ext="wav", rate=44100, dtype='float32'):
+    # decode_wav only returns float32
+    t = time.perf_counter_ns()
+    sig = _tf_function('tf_decode_wav')(fp, ext, rate)
+    _tick('decode', t)
+    return sig
+
+
+def load_aubio(fp, dtype='float32'):
+    # aubio only decodes to float32
+    import aubio
+    t = time.perf_counter_ns()
     f = aubio.source(fp, hop_size=1024)
-    sig = np.zeros(f.duration, dtype=aubio.float_type)
+    # do_multi reads all channels, f() would downmix them
+    sig = np.zeros((f.channels, f.duration), dtype=aubio.float_type)
+    t = _tick('open', t)
     total_frames = 0
     while True:
-        samples, read = f()
-        sig[total_frames:total_frames + read] = samples[:read]
+        samples, read = f.do_multi()
+        sig[:, total_frames:total_frames + read] = samples[:, :read]
+        total_frames += read
+        if read < f.hop_size:
+            break
+    _tick('decode', t)
+    return sig
+
+
+def excerpt_aubio(fp, offset, num_frames, dtype='float32'):
+    import aubio
+    f = aubio.source(fp, hop_size=1024)
+    f.seek(offset)
+    sig = np.zeros((f.channels, num_frames), dtype=aubio.float_type)
+    total_frames = 0
+    while total_frames < num_frames:
+        samples, read = f.do_multi()
+        read = min(read, num_frames - total_frames)
+        sig[:, total_frames:total_frames + read] = samples[:, :read]
         total_frames += read
         if read < f.hop_size:
             break
+    return np.ascontiguousarray(sig[:, :total_frames])
+
+
+def stream_aubio(fp, frames_per_chunk):
+    import aubio
+    f = aubio.source(fp, hop_size=frames_per_chunk)
+    while True:
+        samples, read = f.do_multi()
+        if read:
+            yield np.ascontiguousarray(samples[:, :read])
+        if read < f.hop_size:
+            break
+
+
+def load_torchaudio(fp, backend=None, dtype='float32'):
+    import torchaudio
+    t = time.perf_counter_ns()
+    # without normalization, 16-bit PCM is returned as int16
+    sig, rate = torchaudio.load(fp, backend=backend, normalize=dtype != 'int16')
+    _tick('decode', t)
     return sig
 
 
-def load_torchaudio(fp):
-    sig, rate = torchaudio.load(fp)
+def excerpt_torchaudio(fp, offset, num_frames, backend=None, dtype='float32'):
+    import torchaudio
+    sig, rate = torchaudio.load(
+        fp, frame_offset=offset, num_frames=num_frames, backend=backend,
+        normalize=dtype != 'int16'
+    )
     return sig
 
-def load_torchaudio_streamreader(fp):
+
+def load_torchaudio_streamreader(fp, dtype='float32'):
     """
     Decode audio via FFmpeg using torchaudio.io.StreamReader.
-    Returns a flat float32 numpy array of samples.
+    Returns a channels-first numpy array, in the sample format FFmpeg
+    converts to (float32 or int16). The interleaved chunks are copied into a
+    single buffer that is preallocated from the stream metadata.
     """
+    from torchaudio.io import StreamReader
+    t = time.perf_counter_ns()
     reader = StreamReader(src=fp)
-    reader.add_audio_stream(frames_per_chunk=2**20)
-    chunks = []
+    info = reader.get_src_stream_info(reader.default_audio_stream)
+    reader.add_basic_audio_stream(
+        frames_per_chunk=2**20, format='s16p' if dtype == 'int16' else 'fltp'
+    )
+    # num_frames is 0 if the container does not store it
+    sig = np.empty((info.num_frames or 2**20, info.num_channels), dtype=dtype)
+    t = _tick('open', t)
+    total_frames = 0
     for frame in reader.stream():
         # frame may be a Tensor or a tuple of (Tensor, metadata)
         tensor = frame[0] if isinstance(frame, (list, tuple)) else frame
-        chunks.append(tensor)
-    if not chunks:
-        return np.array([], dtype=np.float32)
-    audio = torch.cat(chunks, dim=0)
-    return audio.numpy().flatten()
+        read = tensor.shape[0]
+        sig = _reserve(sig, total_frames + read)
+        sig[total_frames:total_frames + read] = tensor.numpy()
+        total_frames += read
+    t = _tick('decode', t)
+    sig = _channels_first(sig[:total_frames])
+    _tick('convert', t)
+    return sig
 
-def load_stempeg(fp):
+def excerpt_torchaudio_streamreader(fp, offset, num_frames, dtype='float32'):
+    """
+    Seek to `offset` (in frames) and decode a single chunk of `num_frames`.
+    """
+    from torchaudio.io import StreamReader
+    reader = StreamReader(src=fp)
+    info = reader.get_src_stream_info(reader.default_audio_stream)
+    reader.add_basic_audio_stream(
+        frames_per_chunk=num_frames, format='s16p' if dtype == 'int16' else 'fltp'
+    )
+    reader.seek(offset / info.sample_rate, mode="precise")
+    for frame in reader.stream():
+        tensor = frame[0] if isinstance(frame, (list, tuple)) else frame
+        return _channels_first(tensor.numpy())
+    return np.zeros((info.num_channels, 0), dtype=dtype)
+
+
+def stream_torchaudio_streamreader(fp, frames_per_chunk):
+    from torchaudio.io import StreamReader
+    reader = StreamReader(src=fp)
+    reader.add_audio_stream(frames_per_chunk=frames_per_chunk)
+    for frame in reader.stream():
+        tensor = frame[0] if isinstance(frame, (list, tuple)) else frame
+        yield _channels_first(tensor.numpy())
+
+def load_stempeg(fp, dtype='float32'):
     """
     Use stempeg.read_stems to read any audio file (STEM or standard formats).
-    Returns a flat float32 numpy array of samples.
+    Returns a float32 numpy array: stempeg always reads float32 from the
+    ffmpeg pipe, so int16 is not available.
     """
+    import stempeg
+    t = time.perf_counter_ns()
+    # probed once here, read_stems would otherwise probe the file itself
+    info = stempeg.Info(fp)
+    t = _tick('open', t)
     # Read stems (or single-stream files) into a numpy array
     audio, sample_rate = stempeg.read_stems(
-        fp
+        fp, dtype=np.float32, info=info
     )
-    # Flatten multi-dimensional output (streams/channels) into 1D
-    return audio.flatten()
+    t = _tick('decode', t)
+    # ([stems,] frames, channels) to ([stems,] channels, frames)
+    sig = np.ascontiguousarray(np.swapaxes(audio, -1, -2))
+    _tick('convert', t)
+    return sig
 
-def load_soundfile(fp):
-    sig, rate = sf.read(fp)
+def excerpt_stempeg(fp, offset, num_frames, dtype='float32'):
+    """
+    stempeg seeks in seconds, so the sample rate is probed first. Always
+    float32, as `load_stempeg`.
+    """
+    import stempeg
+    info = stempeg.Info(fp)
+    rate = info.sample_rate(0)
+    audio, sample_rate = stempeg.read_stems(
+        fp,
+        start=offset / rate,
+        duration=num_frames / rate,
+        dtype=np.float32,
+        info=info,
+    )
+    return np.ascontiguousarray(np.swapaxes(audio, -1, -2))
+
+def load_soundfile(fp, dtype='float32'):
+    import soundfile as sf
+    t = time.perf_counter_ns()
+    # sf.read, with the phases taken apart
+    with sf.SoundFile(fp) as f:
+        t = _tick('open', t)
+        # libsndfile converts to `dtype` while decoding
+        sig = f.read(dtype=dtype, always_2d=True)
+        t = _tick('decode', t)
+    sig = _channels_first(sig)
+    _tick('convert', t)
     return sig
 
 
-def load_scipy(fp):
+def excerpt_soundfile(fp, offset, num_frames, dtype='float32'):
+    import soundfile as sf
+    sig, rate = sf.read(fp, start=offset, frames=num_frames, dtype=dtype, always_2d=True)
+    return _channels_first(sig)
+
+
+def stream_soundfile(fp, frames_per_chunk):
+    import soundfile as sf
+    for block in sf.blocks(fp, blocksize=frames_per_chunk, dtype='float32', always_2d=True):
+        yield _channels_first(block)
+
+
+def load_scipy(fp, dtype='float32'):
+    from scipy.io import wavfile
+    t = time.perf_counter_ns()
     rate, sig = wavfile.read(fp)
-    sig = sig.astype('float32') / 32767
+    t = _tick('decode', t)
+    sig = _as_dtype(_channels_first(sig), dtype)
+    _tick('convert', t)
     return sig
 
 
-def load_scipy_mmap(fp):
+def excerpt_scipy(fp, offset, num_frames, dtype='float32'):
+    from scipy.io import wavfile
+    # no seeking, the whole file is read before slicing
+    rate, sig = wavfile.read(fp)
+    return _as_dtype(_channels_first(sig[offset:offset + num_frames]), dtype)
+
+
+def load_scipy_mmap(fp, dtype='float32'):
+    from scipy.io import wavfile
+    t = time.perf_counter_ns()
     rate, sig = wavfile.read(fp, mmap=True)
-    sig = sig.astype('float32') / 32767
+    # only the header is read, the samples are paged in by the conversion
+    t = _tick('open', t)
+    # mono int16 stays a (copy-on-write) view of the mapped file
+    sig = _as_dtype(_channels_first(sig), dtype)
+    _tick('convert', t)
     return sig
 
 
-def load_ar_ffmpeg(fp):
+def excerpt_scipy_mmap(fp, offset, num_frames, dtype='float32'):
+    from scipy.io import wavfile
+    rate, sig = wavfile.read(fp, mmap=True)
+    return _as_dtype(_channels_first(sig[offset:offset + num_frames]), dtype)
+
+
+def load_ar_ffmpeg(fp, dtype='float32'):
+    """
+    The int16 buffers from the ffmpeg pipe are copied (or scaled to float32)
+    straight into a buffer that is preallocated from the (estimated)
+    duration.
+    """
+    import audioread.ffdec
+    t = time.perf_counter_ns()
     with audioread.ffdec.FFmpegAudioFile(fp) as f:
-        total_frames = 0
+        sig = np.empty(int(f.duration * f.samplerate + 1) * f.channels, dtype=dtype)
+        t = _tick('open', t)
+        total_samples = 0
         for buf in f:
-            sig = _convert_buffer_to_float(buf)
-            sig = sig.reshape(f.channels, -1)
-            total_frames += sig.shape[1]
+            # waiting for the next buffer from the ffmpeg pipe
+            t = _tick('decode', t)
+            read = len(buf) // 2
+            sig = _reserve(sig, total_samples + read)
+            if dtype == 'int16':
+                sig[total_samples:total_samples + read] = np.frombuffer(buf, '<i2')
+            else:
+                _convert_buffer_to_float(buf, out=sig[total_samples:total_samples + read])
+            total_samples += read
+            t = _tick('convert', t)
+        t = _tick('decode', t)
+        # the samples are interleaved
+        sig = _channels_first(sig[:total_samples].reshape(-1, f.channels))
+        _tick('convert', t)
         return sig
 
 
-def load_soxbindings(fp):
+def excerpt_ar_ffmpeg(fp, offset, num_frames, dtype='float32'):
+    """
+    audioread cannot seek: buffers are decoded from the start of the file
+    and dropped until `offset` is reached.
+    """
+    import audioread.ffdec
+    with audioread.ffdec.FFmpegAudioFile(fp) as f:
+        total_frames = 0
+        chunks = []
+        for buf in f:
+            if dtype == 'int16':
+                sig = np.frombuffer(buf, '<i2').reshape(-1, f.channels)
+            else:
+                sig = _convert_buffer_to_float(buf).reshape(-1, f.channels)
+            start = max(offset - total_frames, 0)
+            stop = offset + num_frames - total_frames
+            total_frames += sig.shape[0]
+            if start < sig.shape[0]:
+                chunks.append(sig[start:stop])
+            if total_frames >= offset + num_frames:
+                break
+        if not chunks:
+            return np.zeros((f.channels, 0), dtype=dtype)
+        return _channels_first(np.concatenate(chunks))
+
+
+def stream_ar_ffmpeg(fp, frames_per_chunk):
+    """
+    Re-chunks the ffmpeg pipe buffers into `frames_per_chunk` frames.
+    """
+    import audioread.ffdec
+    with audioread.ffdec.FFmpegAudioFile(fp) as f:
+        chunk_bytes = frames_per_chunk * f.channels * 2
+        pending = bytearray()
+        for buf in f:
+            pending += buf
+            while len(pending) >= chunk_bytes:
+                sig = _convert_buffer_to_float(bytes(pending[:chunk_bytes]))
+                del pending[:chunk_bytes]
+                yield _channels_first(sig.reshape(-1, f.channels))
+        if pending:
+            yield _channels_first(_convert_buffer_to_float(bytes(pending)).reshape(-1, f.channels))
+
+
+def load_soxbindings(fp, dtype='float32'):
+    import soxbindings
+    t = time.perf_counter_ns()
     tfm = soxbindings.Transformer()
     array_out = tfm.build_array(input_filepath=fp)
-    return array_out
+    t = _tick('decode', t)
+    sig = _as_dtype(_channels_first(array_out), dtype)
+    _tick('convert', t)
+    return sig
 
 
-def load_pydub(fp):
+def load_pydub(fp, dtype='float32'):
+    from pydub import AudioSegment
+    t = time.perf_counter_ns()
     song = AudioSegment.from_file(fp)
-    sig = np.asarray(song.get_array_of_samples(), dtype='float32')
-    sig = sig.reshape(song.channels, -1) / 32767.
+    t = _tick('decode', t)
+    # view the raw (interleaved) PCM bytes and copy or scale them in one pass
+    samples = np.frombuffer(song.raw_data, dtype=song.array_type)
+    sig = _as_dtype(_channels_first(samples.reshape(-1, song.channels)), dtype)
+    if not sig.flags.writeable:
+        # the view of the bytes is read-only
+        sig = sig.copy()
+    _tick('convert', t)
     return sig
 
 
-def load_librosa(fp):
-    # loading with `sr=None` is disabling the internal resampling
-    sig, rate = librosa.load(fp, sr=None)
+def excerpt_pydub(fp, offset, num_frames, dtype='float32'):
+    """
+    pydub seeks in seconds (ffmpeg `-ss`), so the sample rate is probed first.
+    """
+    from pydub import AudioSegment
+    from pydub.utils import mediainfo
+    rate = int(mediainfo(fp)['sample_rate'])
+    song = AudioSegment.from_file(
+        fp, start_second=offset / rate, duration=num_frames / rate
+    )
+    samples = np.frombuffer(song.raw_data, dtype=song.array_type)
+    sig = _as_dtype(_channels_first(samples.reshape(-1, song.channels)[:num_frames]), dtype)
     return sig
 
 
-def _convert_buffer_to_float(buf, n_bytes=2, dtype=np.float32):
+def load_librosa(fp, dtype='float32'):
+    import librosa
+    # loading with `sr=None` is disabling the internal resampling and
+    # `mono=False` the downmix, librosa only returns floats
+    t = time.perf_counter_ns()
+    sig, rate = librosa.load(fp, sr=None, mono=False, dtype=np.float32)
+    _tick('decode', t)
+    return np.atleast_2d(sig)
+
+
+def excerpt_librosa(fp, offset, num_frames, dtype='float32'):
+    import librosa
+    rate = librosa.get_samplerate(fp)
+    sig, rate = librosa.load(
+        fp, sr=None, mono=False, offset=offset / rate, duration=num_frames / rate,
+        dtype=np.float32
+    )
+    return np.atleast_2d(sig)
+
+
+def load_sample_store(fp, store=None, dtype='float32'):
+    """
+    Zero-copy view of the pre-decoded samples of `fp` in a memory-mapped
+    sample store (see sample_store.py). Only a float32 request on an int16
+    store needs a copy.
+    """
+    import torch
+    import sample_store
+    t = time.perf_counter_ns()
+    sig = sample_store.samples_of(fp, store)
+    t = _tick('open', t)
+    sig = _as_dtype(sig, dtype)
+    t = _tick('convert', t)
+    sig = torch.from_numpy(sig)
+    _tick('tensorize', t)
+    return sig
+
+
+def excerpt_sample_store(fp, offset, num_frames, store=None, dtype='float32'):
+    import torch
+    import sample_store
+    # the audio is stored channels-first, as the loaders return it
+    sig = sample_store.samples_of(fp, store)
+    return torch.from_numpy(_as_dtype(sig[..., offset:offset + num_frames], dtype))
+
+
+def _channels_first(sig):
+    """
+    `(frames,)` or interleaved `(frames, channels)` samples as a contiguous
+    `(channels, frames)` array. Mono audio is not copied.
+    """
+    return np.ascontiguousarray(np.atleast_2d(sig.T))
+
+
+def as_tensor(audio):
+    """
+    Loader output as a `(1, channels, frames)` torch tensor, stems of
+    stempeg being stacked along the channels.
+    """
+    import torch
+    t = time.perf_counter_ns()
+    audio = torch.as_tensor(audio)
+    if audio.ndim == 2:
+        audio = audio.unsqueeze(0)
+    else:
+        audio = audio.reshape(1, -1, audio.shape[-1])
+    _tick('tensorize', t)
+    return audio
+
+
+def _as_dtype(sig, dtype):
+    """
+    `sig` as it is if it already has `dtype`, otherwise as float32, with
+    integer samples (int16, the uint8 of 8-bit WAV, the int32 of 24 and
+    32-bit WAV) scaled to [-1, 1] by the maximum of their type, unsigned
+    ones around their midpoint. int16 is only ever returned without
+    conversion.
+    """
+    if sig.dtype == dtype:
+        return sig
+    if sig.dtype.kind == 'u':
+        offset = np.iinfo(sig.dtype).max // 2 + 1
+        out = np.subtract(sig, np.float32(offset), dtype=np.float32)
+        return np.multiply(out, np.float32(1. / (offset - 1)), out=out)
+    if sig.dtype.kind == 'i':
+        return np.multiply(sig, np.float32(1. / np.iinfo(sig.dtype).max), dtype=np.float32)
+    return sig.astype(np.float32, copy=False)
+
+
+def _convert_buffer_to_float(buf, n_bytes=2, dtype=np.float32, out=None):
     # taken from librosa.util.utils
     # Invert the scale of the data
     scale = 1./float(1 << ((8 * n_bytes) - 1))
     # Construct the format string
     fmt = '<i{:d}'.format(n_bytes)
-    # Rescale and format the data buffer
-    out = scale * np.frombuffer(buf, fmt).astype(dtype)
+    # Rescale and format the data buffer in a single pass (into `out`)
+    out = np.multiply(np.frombuffer(buf, fmt), dtype(scale), dtype=dtype, out=out)
     return out
 
 
+def _reserve(buf, size):
+    """Return `buf`, or a copy grown along the first axis, to hold `size` items."""
+    if size <= buf.shape[0]:
+        return buf
+    grown = np.empty((max(size, 2 * buf.shape[0]),) + buf.shape[1:], dtype=buf.dtype)
+    grown[:buf.shape[0]] = buf
+    return grown
+
+
 def info_soundfile(fp):
+    import soundfile as sf
     info = {}
     info['duration'] = sf.info(fp).duration
     info['samples'] = int(sf.info(fp).duration * sf.info(fp).samplerate)
@@ -159,7 +580,19 @@ def info_soundfile(fp):
     return info
 
 
+def info_soundfile_single(fp):
+    import soundfile as sf
+    info = {}
+    si = sf.info(fp)
+    info['duration'] = si.duration
+    info['samples'] = si.frames
+    info['channels'] = si.channels
+    info['sampling_rate'] = si.samplerate
+    return info
+
+
 def info_audioread(fp):
+    import audioread
     info = {}
     with audioread.audio_open(fp) as f:
         info['duration'] = f.duration
@@ -172,7 +605,19 @@ def info_audioread(fp):
     return info
 
 
+def info_audioread_single(fp):
+    import audioread
+    info = {}
+    with audioread.audio_open(fp) as f:
+        info['duration'] = f.duration
+        info['samples'] = int(f.duration * f.samplerate)
+        info['channels'] = f.channels
+        info['sampling_rate'] = f.samplerate
+    return info
+
+
 def info_aubio(fp):
+    import aubio
     info = {}
     with aubio.source(fp) as f:
         info['duration'] = f.duration / f.samplerate
@@ -185,7 +630,19 @@ def info_aubio(fp):
     return info
 
 
+def info_aubio_single(fp):
+    import aubio
+    info = {}
+    with aubio.source(fp) as f:
+        info['duration'] = f.duration / f.samplerate
+        info['samples'] = f.duration
+        info['channels'] = f.channels
+        info['sampling_rate'] = f.samplerate
+    return info
+
+
 def info_sox(fp):
+    import sox
     info = {}
     info['duration'] = sox.file_info.duration(fp)
     info['samples'] = sox.file_info.num_samples(fp)
@@ -194,7 +651,23 @@ def info_sox(fp):
     return info
 
 
+def info_sox_single(fp):
+    # a single `soxi` call prints all fields, pysox runs one per field
+    import subprocess
+    fields = {}
+    for line in subprocess.check_output(['soxi', fp], universal_newlines=True).splitlines():
+        key, _, value = line.partition(':')
+        fields[key.strip()] = value.strip()
+    info = {}
+    info['sampling_rate'] = int(fields['Sample Rate'])
+    info['channels'] = int(fields['Channels'])
+    info['samples'] = int(fields['Duration'].split('=')[1].split()[0])
+    info['duration'] = info['samples'] / info['sampling_rate']
+    return info
+
+
 def info_pydub(fp):
+    from pydub import AudioSegment
     info = {}
     f = AudioSegment.from_file(fp)
     info['duration'] = f.duration_seconds
@@ -207,7 +680,20 @@ def info_pydub(fp):
     return info
 
 
+def info_pydub_single(fp):
+    # ffprobe reads the header, without decoding the file like AudioSegment
+    from pydub.utils import mediainfo
+    info = {}
+    si = mediainfo(fp)
+    info['duration'] = float(si['duration'])
+    info['sampling_rate'] = int(si['sample_rate'])
+    info['samples'] = int(round(info['duration'] * info['sampling_rate']))
+    info['channels'] = int(si['channels'])
+    return info
+
+
 def info_torchaudio(fp):
+    import torchaudio
     info = {}
     si = torchaudio.info(str(fp))
     info["sampling_rate"] = si.sample_rate
@@ -218,6 +704,7 @@ def info_torchaudio(fp):
 
 
 def info_stempeg(fp):
+    import stempeg
     info = {}
     si = stempeg.Info(fp)
     info["sampling_rate"] = si.sample_rate(0)
@@ -225,3 +712,179 @@ def info_stempeg(fp):
     info["channels"] = si.channels(0)
     info["duration"] = si.duration(0)
     return info
+
+
+FFMPEG_FORMATS = ('wav', 'mp3', 'mp4', 'ogg', 'flac')
+# `dtype` of every load and excerpt function: int16 is returned as decoded by loaders
+# with `native_dtype`, all other loaders return float32 instead
+DTYPES = ('float32', 'int16')
+SNDFILE_FORMATS = ('wav', 'mp3', 'ogg', 'flac')
+
+# metadata backends: (module, formats, consecutive-call function, single-open
+# function). The consecutive-call functions open the file once per field;
+# torchaudio and stempeg return all fields from one call in both modes.
+INFO_FUNCTIONS = OrderedDict([
+    ('soundfile', ('soundfile', SNDFILE_FORMATS, info_soundfile, info_soundfile_single)),
+    ('audioread', ('audioread', FFMPEG_FORMATS, info_audioread, info_audioread_single)),
+    ('aubio', ('aubio', FFMPEG_FORMATS, info_aubio, info_aubio_single)),
+    ('sox', ('sox', SNDFILE_FORMATS, info_sox, info_sox_single)),
+    ('pydub', ('pydub', FFMPEG_FORMATS, info_pydub, info_pydub_single)),
+    ('torchaudio', ('torchaudio', FFMPEG_FORMATS, info_torchaudio, info_torchaudio)),
+    ('stempeg', ('stempeg', FFMPEG_FORMATS, info_stempeg, info_stempeg)),
+])
+
+
+def available_info(ext=None):
+    """Names of the metadata backends that are installed (and support `ext`)."""
+    names = []
+    for name, (module, formats, _, _) in INFO_FUNCTIONS.items():
+        if ext is not None and ext not in formats:
+            continue
+        if importlib.util.find_spec(module) is not None:
+            names.append(name)
+    return names
+
+
+class Loader(object):
+    """
+    Registry entry of a benchmarked loader.
+
+    `modules` are the imports the loader needs, `formats` the file
+    extensions it can decode. The capability flags describe whether the
+    backend can seek to an excerpt without decoding from the start, decode
+    incrementally (stream), return the native (integer) sample dtype and
+    decode from a file-like object instead of a path (filelike, see
+    `prefetch.py`). An optional `check` callable tells whether the loader can run at all,
+    beyond its modules being installed, and `check_format(ext)` whether it
+    can decode `ext` at the moment, beyond `formats`.
+    """
+
+    def __init__(self, name, function, modules, formats, decoder,
+                 seek=False, stream=False, native_dtype=False, filelike=False,
+                 kwargs=None, check=None, check_format=None):
+        self.name = name
+        self.function = function
+        self.modules = tuple(modules)
+        self.formats = tuple(formats)
+        self.decoder = decoder
+        self.seek = seek
+        self.stream = stream
+        self.native_dtype = native_dtype
+        self.filelike = filelike
+        self.kwargs = kwargs or {}
+        self.check = check
+        self.check_format = check_format
+
+    def __repr__(self):
+        return "Loader(%r)" % self.name
+
+    def available(self):
+        """Check that all backend modules are installed, without importing them."""
+        for module in self.modules:
+            try:
+                # find_spec imports the parents of dotted names
+                if importlib.util.find_spec(module.split('.')[0]) is None:
+                    return False
+            except (ImportError, ValueError):
+                return False
+        if self.check is not None:
+            return self.check()
+        return True
+
+    def import_modules(self):
+        for module in self.modules:
+            importlib.import_module(module)
+
+    def supports(self, ext):
+        return ext in self.formats and (self.check_format is None or self.check_format(ext))
+
+    def _bind(self, prefix):
+        function = globals().get(self.function.replace('load_', prefix, 1))
+        if function is None:
+            return None
+        if self.kwargs:
+            return functools.partial(function, **self.kwargs)
+        return function
+
+    @property
+    def load(self):
+        return self._bind('load_')
+
+    @property
+    def excerpt(self):
+        return self._bind('excerpt_')
+
+    @property
+    def iter_chunks(self):
+        """Generator function `(fp, frames_per_chunk)` of streaming loaders."""
+        return self._bind('stream_')
+
+
+LOADERS = OrderedDict()
+
+
+def register(name, function, modules, formats, decoder, **capabilities):
+    LOADERS[name] = Loader(name, function, modules, formats, decoder, **capabilities)
+    return LOADERS[name]
+
+
+def get_loader(name):
+    try:
+        return LOADERS[name]
+    except KeyError:
+        raise ValueError(
+            "Unknown loader '%s', choose from: %s" % (name, ", ".join(LOADERS))
+        )
+
+
+def available_loaders(ext=None, **capabilities):
+    """
+    Names of the installed loaders that support `ext` and match all
+    given capabilities, e.g. `available_loaders('mp3', decoder='ffmpeg')`.
+    """
+    names = []
+    for name, loader in LOADERS.items():
+        if ext is not None and not loader.supports(ext):
+            continue
+        if any(getattr(loader, key) != value for key, value in capabilities.items()):
+            continue
+        if not loader.available():
+            continue
+        names.append(name)
+    return names
+
+
+register('stempeg', 'load_stempeg', ['stempeg'], FFMPEG_FORMATS, 'ffmpeg',
+         seek=True)
+register('ar_ffmpeg', 'load_ar_ffmpeg', ['audioread.ffdec'], FFMPEG_FORMATS, 'ffmpeg',
+         stream=True, native_dtype=True)
+register('torchaudio-ffmpeg', 'load_torchaudio', ['torchaudio'], FFMPEG_FORMATS, 'ffmpeg',
+         seek=True, native_dtype=True, filelike=True, kwargs=dict(backend='ffmpeg'))
+register('torchaudio-streamreader', 'load_torchaudio_streamreader', ['torch', 'torchaudio.io'], FFMPEG_FORMATS, 'ffmpeg',
+         seek=True, stream=True, native_dtype=True)
+register('torchaudio-sox_io', 'load_torchaudio', ['torchaudio'], SNDFILE_FORMATS, 'sox',
+         seek=True, native_dtype=True, kwargs=dict(backend='sox'))
+register('torchaudio-soundfile', 'load_torchaudio', ['torchaudio', 'soundfile'], SNDFILE_FORMATS, 'libsndfile',
+         seek=True, native_dtype=True, filelike=True, kwargs=dict(backend='soundfile'))
+register('soundfile', 'load_soundfile', ['soundfile'], SNDFILE_FORMATS, 'libsndfile',
+         seek=True, stream=True, native_dtype=True, filelike=True)
+register('scipy', 'load_scipy', ['scipy.io.wavfile'], ('wav',), 'native',
+         native_dtype=True, filelike=True)
+register('scipy_mmap', 'load_scipy_mmap', ['scipy.io.wavfile'], ('wav',), 'native',
+         seek=True, native_dtype=True)
+register('aubio', 'load_aubio', ['aubio'], FFMPEG_FORMATS, 'ffmpeg',
+         seek=True, stream=True)
+register('pydub', 'load_pydub', ['pydub', 'pydub.utils'], FFMPEG_FORMATS, 'ffmpeg',
+         seek=True, native_dtype=True, filelike=True)
+register('librosa', 'load_librosa', ['librosa'], FFMPEG_FORMATS, 'libsndfile',
+         seek=True)
+register('sample_store', 'load_sample_store', ['torch', 'sample_store'], FFMPEG_FORMATS, 'predecoded',
+         seek=True, native_dtype=True,
+         check=lambda: importlib.import_module('sample_store').exists(),
+         check_format=lambda ext: ext in importlib.import_module('sample_store').formats())
+register('soxbindings', 'load_soxbindings', ['soxbindings'], SNDFILE_FORMATS, 'sox')
+register('tfio_fromffmpeg', 'load_tfio_fromffmpeg', ['tensorflow', 'tensorflow_io'], FFMPEG_FORMATS, 'ffmpeg',
+         native_dtype=True)
+register('tfio_fromaudio', 'load_tfio_fromaudio', ['tensorflow', 'tensorflow_io'], ('wav', 'ogg', 'flac'), 'native',
+         native_dtype=True)
+register('tf_decode_wav', 'load_tf_decode_wav', ['tensorflow'], ('wav',), 'native')
@@ -0,0 +1,229 @@
+"""
+Persistent corpus manifest.
+
+Scans a corpus once and records every audio file with its size,
+modification time, duration directory and metadata (sampling rate,
+channels, samples, duration) in an indexed SQLite file, so that the
+benchmarks neither walk the corpus nor `stat` or probe its files on every
+run. Directories are listed and files are probed by a thread pool, which
+hides the latency of network file systems. Running the builder again only
+probes new or changed files and drops deleted ones.
+
+    python manifest.py --root AUDIO --out manifest.sqlite --ext wav mp3 mp4 ogg flac
+"""
+import argparse
+import glob
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+import loaders
+
+
+DEFAULT_MANIFEST = os.environ.get('AUDIO_MANIFEST', 'manifest.sqlite')
+DEFAULT_WORKERS = 32
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    ext TEXT NOT NULL,
+    cell INTEGER,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sampling_rate INTEGER,
+    channels INTEGER,
+    samples INTEGER,
+    duration REAL
+);
+CREATE INDEX IF NOT EXISTS files_ext_cell ON files (ext, cell);
+"""
+
+FIELDS = ('path', 'ext', 'cell', 'size', 'mtime_ns', 'sampling_rate', 'channels', 'samples', 'duration')
+
+
+def get_files(root_dir, extension):
+    root_dir = os.path.expanduser(root_dir)
+    pattern = os.path.join(root_dir, '**', f'*.{extension}')
+    files = glob.glob(pattern, recursive=True)
+    print(f"[get_files] Found {len(files)} '*.{extension}' files under {root_dir}")
+    return files
+
+
+def duration_cells(root, extension, records=None):
+    """
+    Sorted list of `(duration, files)`, one per sub-directory of `root`
+    that is named after the duration of its files in seconds. With the
+    `records` of a `load`, the cells come from the manifest's files under
+    `root` instead of walking it.
+    """
+    if records is not None:
+        prefix = os.path.join(os.path.abspath(os.path.expanduser(root)), '')
+        grouped = {}
+        for fp, record in records.items():
+            if record['ext'] == extension and record['cell'] is not None and fp.startswith(prefix):
+                grouped.setdefault(record['cell'], []).append(fp)
+        return [(duration, sorted(files)) for duration, files in sorted(grouped.items())]
+    cells = []
+    for root_dir, dirs, _ in sorted(os.walk(os.path.expanduser(root))):
+        for audio_dir in dirs:
+            try:
+                duration = int(audio_dir)
+            except ValueError:
+                print(f"[skip] Cannot parse duration from '{audio_dir}'")
+                continue
+            files = sorted(get_files(os.path.join(root_dir, audio_dir), extension))
+            cells.append((duration, files))
+    return sorted(cells, key=lambda cell: cell[0])
+
+
+def probe(fp):
+    """Metadata of `fp` from soundfile, or torchaudio for formats libsndfile cannot read."""
+    try:
+        return loaders.info_soundfile_single(fp)
+    except Exception:
+        return loaders.info_torchaudio(fp)
+
+
+def _cell(rel_path):
+    # the innermost directory named after the duration of its files
+    for part in reversed(os.path.dirname(rel_path).split(os.sep)):
+        try:
+            return int(part)
+        except ValueError:
+            continue
+    return None
+
+
+def _list_dir(path, extensions):
+    files, dirs = [], []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    dirs.append(entry.path)
+                elif os.path.splitext(entry.name)[1][1:] in extensions:
+                    stat = entry.stat()
+                    files.append((entry.path, stat.st_size, stat.st_mtime_ns))
+    except OSError as e:
+        print(f"[error] Scanning '{path}': {e}")
+    return files, dirs
+
+
+def scan(root, extensions, workers=DEFAULT_WORKERS):
+    """
+    `{relative path: (size, mtime_ns)}` of all files with one of
+    `extensions` under `root`, listing directories concurrently.
+    """
+    root = os.path.abspath(os.path.expanduser(root))
+    extensions = set(extensions)
+    found = {}
+    with ThreadPoolExecutor(workers) as pool:
+        pending = [pool.submit(_list_dir, root, extensions)]
+        while pending:
+            files, dirs = pending.pop().result()
+            for fp, size, mtime_ns in files:
+                found[os.path.relpath(fp, root)] = (size, mtime_ns)
+            pending += [pool.submit(_list_dir, d, extensions) for d in dirs]
+    return found
+
+
+def connect(path=None):
+    db = sqlite3.connect(path or DEFAULT_MANIFEST)
+    db.executescript(SCHEMA)
+    return db
+
+
+def update(path, root, extensions=loaders.FFMPEG_FORMATS, workers=DEFAULT_WORKERS):
+    """
+    Create or refresh the manifest at `path` for the corpus under `root`.
+    Only files that are new or whose size or modification time changed are
+    probed; files that disappeared are removed.
+    """
+    root = os.path.abspath(os.path.expanduser(root))
+    found = scan(root, extensions, workers=workers)
+    with connect(path) as db:
+        db.execute("INSERT OR REPLACE INTO meta VALUES ('root', ?)", (root,))
+        known = {rel: (size, mtime_ns) for rel, size, mtime_ns in db.execute(
+            "SELECT path, size, mtime_ns FROM files"
+        )}
+        removed = [(rel,) for rel in known if rel not in found]
+        changed = [rel for rel, stat in found.items() if known.get(rel) != stat]
+
+        def record(rel):
+            try:
+                info = probe(os.path.join(root, rel))
+            except Exception as e:
+                print(f"[error] Probing '{rel}': {e}")
+                return None
+            size, mtime_ns = found[rel]
+            return (
+                rel, os.path.splitext(rel)[1][1:], _cell(rel), size, mtime_ns,
+                int(info['sampling_rate']), int(info['channels']),
+                int(info['samples']), float(info['duration']),
+            )
+
+        with ThreadPoolExecutor(workers) as pool:
+            rows = [row for row in pool.map(record, changed) if row is not None]
+        db.executemany("DELETE FROM files WHERE path = ?", removed)
+        db.executemany(f"INSERT OR REPLACE INTO files VALUES ({', '.join('?' * len(FIELDS))})", rows)
+    db.close()
+    print(f"[Manifest] {len(found)} files under '{root}' | {len(rows)} probed | {len(removed)} removed | written to '{path}'")
+    return len(rows), len(removed)
+
+
+def add_arguments(parser):
+    parser.add_argument('--manifest', type=str, default=None,
+                        help='Take files and metadata from this manifest (built from --root if missing) instead of walking --root.')
+    parser.add_argument('--refresh-manifest', action='store_true',
+                        help='Rescan --root and probe new or changed files before loading the manifest.')
+
+
+def from_args(args):
+    """Records of the manifest given by `add_arguments` arguments, or None."""
+    if args.manifest is None:
+        return None
+    return load(args.manifest, extension=args.ext, root=args.root, refresh=args.refresh_manifest)
+
+
+def load(path=None, extension=None, root=None, refresh=False, workers=DEFAULT_WORKERS):
+    """
+    `{absolute path: record}` of all files in the manifest (with the given
+    `extension`). The manifest is built from `root` if it does not exist
+    yet, or refreshed first with `refresh`.
+    """
+    path = path or DEFAULT_MANIFEST
+    if refresh or not os.path.exists(path):
+        if root is None:
+            raise ValueError(f"Manifest '{path}' does not exist and no corpus root was given")
+        update(path, root, workers=workers)
+    with connect(path) as db:
+        (stored_root,) = db.execute("SELECT value FROM meta WHERE key = 'root'").fetchone()
+        query = f"SELECT {', '.join(FIELDS)} FROM files"
+        params = ()
+        if extension is not None:
+            query += " WHERE ext = ?"
+            params = (extension,)
+        rows = db.execute(query + " ORDER BY path", params).fetchall()
+    db.close()
+    records = {}
+    for row in rows:
+        record = dict(zip(FIELDS, row))
+        record['path'] = os.path.join(stored_root, record['path'])
+        records[record['path']] = record
+    return records
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Build or refresh the manifest of an audio corpus.')
+    parser.add_argument('--root', type=str, default='AUDIO')
+    parser.add_argument('--out', type=str, default=DEFAULT_MANIFEST)
+    parser.add_argument('--ext', type=str, nargs='+', default=list(loaders.FFMPEG_FORMATS))
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help='Threads listing directories and probing files.')
+    args = parser.parse_args()
+
+    update(args.out, args.root, extensions=args.ext, workers=args.workers)
@@ -0,0 +1,53 @@
+"""
+Page cache control for cold-read benchmarks.
+
+After the first pass over a corpus, every further pass reads the files from
+the OS page cache, which hides the storage latency that the first epoch on
+a large dataset pays. `evict` drops the cached pages of files with
+`posix_fadvise(POSIX_FADV_DONTNEED)` (no root privileges needed, unlike
+`drop_caches`), and `disk_read_bytes` reports the bytes this process (and
+its reaped children, e.g. the ffmpeg decoders) actually read from storage.
+
+Pages that are still mapped (e.g. by a live `np.memmap`) or dirty are not
+dropped; `evict` writes dirty pages back first.
+"""
+import os
+
+
+def supported():
+    return hasattr(os, 'posix_fadvise')
+
+
+def evict(files):
+    """Drop the cached pages of `files`; the number of files evicted."""
+    if not supported():
+        return 0
+    evicted = 0
+    for fp in files:
+        try:
+            fd = os.open(fp, os.O_RDONLY)
+        except OSError as e:
+            print(f"[error] Evicting '{fp}': {e}")
+            continue
+        try:
+            # dirty pages cannot be dropped
+            os.fdatasync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+            evicted += 1
+        except OSError as e:
+            print(f"[error] Evicting '{fp}': {e}")
+        finally:
+            os.close(fd)
+    return evicted
+
+
+def disk_read_bytes():
+    """Bytes read from storage by this process and its reaped children, or None."""
+    try:
+        with open('/proc/self/io') as f:
+            for line in f:
+                if line.startswith('read_bytes:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
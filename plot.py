@@ -1,19 +1,13 @@
 import pandas as pd
 import seaborn as sns
 import matplotlib.pyplot as plt
+from utils import read_results
 
 
 for package in ['pytorch']:
-    dfs = []
-    for ext in ["wav", "mp3", "mp4", "ogg", "flac"]:
-        try:
-            dfs.append(
-                pd.read_pickle("results/benchmark_%s_%s.pickle" % (package, ext))
-            )
-        except FileNotFoundError:
-            continue
-
-    df = pd.concat(dfs, ignore_index=True)
+    df = read_results("results/benchmark")
+    # in-process loading with the default dtype
+    df = df[(df['measure'] == 'memory') & (df['workers'] == 0) & (df['dtype'] == 'float32')]
 
     sns.set_style("whitegrid")
 
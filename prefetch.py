@@ -0,0 +1,98 @@
+"""
+Asynchronous prefetching of raw file bytes.
+
+The loaders block on reading a file and then on decoding it. On network
+storage the reads can overlap with decoding: `iter_prefetched` runs an
+asyncio event loop in a background thread that keeps up to `concurrency`
+files read or being read ahead of the consumer and hands them, in order, as
+in-memory buffers to it. Loaders registered with `filelike=True` decode directly from
+these buffers.
+
+`read` doubles as a latency-injecting file shim: every read waits
+`latency` seconds first, to simulate the round trip of a network file
+system on local disks.
+"""
+import asyncio
+import io
+import queue
+import threading
+import time
+from collections import deque
+from itertools import islice
+
+
+_DONE = object()
+
+
+def read(fp, latency=0.0):
+    """Bytes of `fp`, read after waiting `latency` seconds."""
+    if latency:
+        time.sleep(latency)
+    with open(fp, 'rb') as f:
+        return f.read()
+
+
+async def _produce(files, out, stop, slots, latency):
+    loop = asyncio.get_running_loop()
+
+    async def fetch(fp):
+        # the latency is awaited, so that waiting files do not hold a thread
+        await asyncio.sleep(latency)
+        return await loop.run_in_executor(None, read, fp)
+
+    files = iter(files)
+    fp = next(files, None)
+    pending = deque()
+    while not stop.is_set():
+        # a read takes one of the `concurrency` slots until the consumer takes its file
+        while fp is not None and slots.acquire(blocking=False):
+            pending.append((fp, asyncio.ensure_future(fetch(fp))))
+            fp = next(files, None)
+        if not pending:
+            if fp is None:
+                break
+            # all files ahead of the consumer are in the queue
+            await loop.run_in_executor(None, slots.acquire)
+            slots.release()
+            continue
+        done_fp, task = pending.popleft()
+        try:
+            item = (done_fp, await task)
+        except Exception as e:
+            item = (done_fp, e)
+        out.put(item)
+    for _, task in pending:
+        task.cancel()
+    out.put(_DONE)
+
+
+def iter_prefetched(files, concurrency=8, latency=0.0):
+    """
+    Yield `(fp, buffer)` for all `files` in order, with `buffer` an
+    `io.BytesIO` of the file's bytes. At most `concurrency` files are
+    read ahead of the consumer, being read or waiting in the queue.
+    """
+    out = queue.Queue()
+    slots = threading.Semaphore(concurrency)
+    stop = threading.Event()
+    thread = threading.Thread(
+        target=asyncio.run,
+        args=(_produce(files, out, stop, slots, latency),),
+        daemon=True,
+    )
+    thread.start()
+    try:
+        while True:
+            item = out.get()
+            if item is _DONE:
+                break
+            slots.release()
+            fp, data = item
+            if isinstance(data, Exception):
+                raise data
+            yield fp, io.BytesIO(data)
+    finally:
+        stop.set()
+        # after an early exit, unblock the producer if it waits for a slot
+        slots.release(concurrency)
+        thread.join()
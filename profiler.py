@@ -0,0 +1,173 @@
+"""
+Sampling profiles of benchmark cells.
+
+A profiled cell writes its samples as collapsed stacks (one
+`frame;frame;...;leaf count` line per distinct stack, the input format of
+flamegraph.pl, inferno-flamegraph and speedscope). With py-spy installed,
+the worker runs under `py-spy record --native`, which also samples the
+native frames of the decoders (libsndfile, libav*, ...) and the DataLoader
+worker processes. Otherwise `SamplingProfiler` samples the Python stack of
+the worker's main thread from a background thread: time spent in native
+code is attributed to the Python frame that called it, and code that holds
+the GIL delays the samples.
+
+    flamegraph.pl results/benchmark/profiles/<cell>.collapsed > cell.svg
+"""
+import os
+import shutil
+import sys
+import threading
+from collections import Counter
+
+import pandas as pd
+
+
+DEFAULT_INTERVAL = 0.002
+
+# stacks through these frames (imports of torch and the backends) are left
+# out of the hotspots, they are start-up and not decoding costs
+EXCLUDE = ('_find_and_load (<frozen importlib._bootstrap>)',)
+
+# leaf frames of a process waiting for others (e.g. the main process for its
+# DataLoader workers), which are left out of the hotspots
+IDLE = (
+    ('select', 'selectors.py'),
+    ('poll', 'selectors.py'),
+    ('_poll', 'connection.py'),
+    ('_recv', 'connection.py'),
+    ('wait', 'threading.py'),
+    ('_wait_for_tstate_lock', 'threading.py'),
+    ('wait', 'popen_fork.py'),
+    ('_try_wait', 'subprocess.py'),
+    ('_communicate', 'subprocess.py'),
+)
+
+
+def is_idle(frame, idle=IDLE):
+    """Whether `frame`, `function (file)`, is one of the `idle` (function, file basename) pairs."""
+    function, _, location = frame.partition(' (')
+    # py-spy writes full paths, with line numbers unless --nolineno
+    location = os.path.basename(location.rstrip(')')).split(':')[0]
+    return (function, location) in idle
+
+
+def py_spy_available():
+    return shutil.which('py-spy') is not None
+
+
+def py_spy_command(out, interval=DEFAULT_INTERVAL, native=True):
+    """Command prefix that runs a command under py-spy, writing collapsed stacks to `out`."""
+    cmd = ['py-spy', 'record', '--format', 'raw', '--nolineno', '--subprocesses',
+           '--rate', str(int(1 / interval)), '--output', out]
+    if native:
+        cmd.append('--native')
+    return cmd + ['--']
+
+
+class SamplingProfiler(object):
+    """
+    Samples the stack of the thread `thread_id` (default: the main thread)
+    every `interval` seconds while started, counting collapsed stacks of
+    `function (file)` frames.
+    """
+
+    def __init__(self, interval=DEFAULT_INTERVAL, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id or threading.main_thread().ident
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def write(self, path):
+        write_collapsed(self.stacks, path)
+
+
+def write_collapsed(stacks, path):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        for stack, count in stacks.most_common():
+            f.write(f"{stack} {count}\n")
+    os.replace(tmp, path)
+
+
+def read_collapsed(path):
+    stacks = Counter()
+    with open(path) as f:
+        for line in f:
+            stack, _, count = line.rstrip('\n').rpartition(' ')
+            if stack:
+                stacks[stack] += int(count)
+    return stacks
+
+
+def hotspots(stacks, top=10, exclude=EXCLUDE, idle=IDLE):
+    """
+    The `top` frames by self time (samples in which the frame is the
+    leaf), with their self and total (inclusive) fraction of all samples
+    of stacks without any of the `exclude` frames and not waiting in one
+    of the `idle` frames.
+    """
+    stacks = {stack: count for stack, count in stacks.items()
+              if not any(frame in exclude for frame in stack.split(';'))
+              and not is_idle(stack.split(';')[-1], idle)}
+    n_samples = sum(stacks.values())
+    self_counts = Counter()
+    total_counts = Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(';')
+        self_counts[frames[-1]] += count
+        for frame in set(frames):
+            total_counts[frame] += count
+    return [
+        dict(
+            rank=rank,
+            frame=frame,
+            self_fraction=count / n_samples,
+            total_fraction=total_counts[frame] / n_samples,
+            n_samples=n_samples,
+        )
+        for rank, (frame, count) in enumerate(self_counts.most_common(top), 1)
+    ]
+
+
+def summarize(profiles, keys, top=10):
+    """
+    DataFrame of the `top` hotspots of every group of cells, from
+    `profiles`, a list of `(cell, path)` of collapsed stack files; the
+    samples of all cells with the same values of `keys` (e.g. lib, ext,
+    measure and workers) are added up.
+    """
+    stacks = {}
+    for cell, path in profiles:
+        stacks.setdefault(tuple(cell[key] for key in keys), Counter()).update(read_collapsed(path))
+    rows = []
+    for group, group_stacks in stacks.items():
+        rows += [dict(zip(keys, group), **row) for row in hotspots(group_stacks, top=top)]
+    return pd.DataFrame(rows, columns=list(keys) + ['rank', 'frame', 'self_fraction', 'total_fraction', 'n_samples'])
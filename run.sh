@@ -1,8 +1,3 @@
-## declare an array variable
-declare -a exts=("wav" "mp3" "mp4" "ogg" "flac")
-
-## now loop through the above array
-for i in "${exts[@]}"
-do
-    python benchmark_pytorch.py --ext "$i"
-done
+## the sweep (extensions, loaders, durations, workers, dtypes, repeats) is
+## declared in sweep.json, cells run in parallel on disjoint cores
+python benchmark.py --sweep sweep.json "$@"
@@ -0,0 +1,123 @@
+"""
+Pre-decoded sample store.
+
+Decodes a corpus once into a single flat binary file (`samples.bin`) and an
+index (`index.json`) that maps every source path to the offset and shape of
+its samples and lists the stored extensions. `loaders.load_sample_store` then returns views into a memory
+map of that file, so loading needs neither a decode nor a copy.
+
+    python sample_store.py --root AUDIO --out STORE --ext wav mp3 mp4 ogg flac
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+
+import loaders
+from manifest import get_files
+
+
+DEFAULT_STORE = os.environ.get('SAMPLE_STORE', 'STORE')
+DTYPES = loaders.DTYPES
+
+_STORES = {}
+_FORMATS = {}
+
+
+def open_store(store=None):
+    """
+    Memory map of the store's samples and its index. The mapping is opened
+    once per process (and thus per DataLoader worker).
+    """
+    store = os.path.abspath(store or DEFAULT_STORE)
+    if store not in _STORES:
+        with open(os.path.join(store, 'index.json')) as f:
+            index = json.load(f)
+        # copy-on-write, so that torch gets a writable array without copying
+        samples = np.memmap(
+            os.path.join(store, 'samples.bin'), dtype=index['dtype'], mode='c'
+        )
+        _STORES[store] = (samples, index['files'])
+    return _STORES[store]
+
+
+def samples_of(fp, store=None):
+    """Channels-first samples of `fp` in the store, a view into its memory map."""
+    samples, index = open_store(store)
+    try:
+        offset, shape = index[os.path.abspath(fp)]
+    except KeyError:
+        raise ValueError(f"'{fp}' is not in the sample store '{os.path.abspath(store or DEFAULT_STORE)}', "
+                         f"rebuild it with sample_store.py") from None
+    return samples[offset:offset + int(np.prod(shape))].reshape(shape)
+
+
+def exists(store=None):
+    return os.path.exists(os.path.join(store or DEFAULT_STORE, 'index.json'))
+
+
+def formats(store=None):
+    """The extensions of the files in the store (none if there is no store); re-read when it is rebuilt."""
+    path = os.path.join(os.path.abspath(store or DEFAULT_STORE), 'index.json')
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except OSError:
+        return ()
+    if _FORMATS.get(path, (None,))[0] != mtime_ns:
+        with open(path) as f:
+            index = json.load(f)
+        # stores built before the extensions were recorded
+        stored = index.get('formats') or sorted({os.path.splitext(fp)[1][1:] for fp in index['files']})
+        _FORMATS[path] = (mtime_ns, tuple(stored))
+    return _FORMATS[path][1]
+
+
+def default_lib(ext):
+    available = loaders.available_loaders(ext)
+    return 'soundfile' if 'soundfile' in available else available[0]
+
+
+def build(files, out_dir, lib=None, dtype='float32'):
+    """
+    Decode `files` into `out_dir` with the registered loader `lib`, or by
+    default with the `default_lib` of every file's extension.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    index = {}
+    offset = 0
+    with open(os.path.join(out_dir, 'samples.bin'), 'wb') as f:
+        for fp in files:
+            file_lib = lib or default_lib(os.path.splitext(fp)[1][1:])
+            try:
+                audio = np.asarray(loaders.get_loader(file_lib).load(fp, dtype=dtype))
+            except Exception as e:
+                print(f"[error] Decoding '{fp}' with loader '{file_lib}': {e}")
+                continue
+            if dtype == 'int16' and audio.dtype != np.int16:
+                audio = np.clip(audio * 32767, -32768, 32767)
+            audio = np.ascontiguousarray(audio, dtype=dtype)
+            f.write(audio.tobytes())
+            index[os.path.abspath(fp)] = [offset, list(audio.shape)]
+            offset += audio.size
+    with open(os.path.join(out_dir, 'index.json'), 'w') as f:
+        formats = sorted({os.path.splitext(fp)[1][1:] for fp in index})
+        json.dump(dict(dtype=dtype, formats=formats, files=index), f)
+    print(f"[SampleStore] {len(index)} files | {offset} samples | {offset * np.dtype(dtype).itemsize / 1024 / 1024:.2f}MB written to '{out_dir}'")
+    return index
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Decode a corpus once into a memory-mappable sample store.')
+    parser.add_argument('--root', type=str, default='AUDIO')
+    parser.add_argument('--out', type=str, default=DEFAULT_STORE)
+    parser.add_argument('--ext', type=str, nargs='+', default=['wav', 'mp3', 'mp4', 'ogg', 'flac'])
+    parser.add_argument('--lib', type=str, default=None,
+                        help='Loader used for decoding (default: soundfile, or the first installed loader supporting the extension).')
+    parser.add_argument('--dtype', type=str, default='float32', choices=DTYPES)
+    args = parser.parse_args()
+
+    files = []
+    for ext in args.ext:
+        files += sorted(get_files(args.root, ext))
+    build(files, args.out, lib=args.lib, dtype=args.dtype)
@@ -0,0 +1,108 @@
+"""
+Scaling curves of the loaders.
+
+Fits, for every loader and format of a benchmark.py result set, a power law
+to the time and memory per file
+
+    metric = a * duration^b_duration * channels^b_channels * sample_rate^b_sample_rate
+
+by least squares in log space (dimensions with a single value in the sweep
+are left out), and a power law in the number of samples alone, `a * n^b`,
+which is plotted over the measured cells. An exponent of 1 means linear
+scaling, below 1 a per-file overhead that dominates small files.
+
+    python benchmark.py --generate --root AUDIO_SCALING --ext wav flac ogg mp4 --channels 1 2 8 --sample-rate 48000 96000 --durations 1 60 600 3600
+    python scaling.py --results results/benchmark
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+import seaborn as sns
+
+from utils import read_results
+
+
+DIMENSIONS = ['duration', 'channels', 'sample_rate']
+
+
+def fit_power_law(df, metric, dimensions):
+    """`(log10 a, {dimension: exponent}, r2)` of `metric` over the `dimensions` of `df`."""
+    df = df[df[metric] > 0]
+    dimensions = [d for d in dimensions if df[d].nunique() > 1]
+    y = np.log10(df[metric].to_numpy(dtype=np.float64))
+    X = np.column_stack([np.ones(len(df))] + [np.log10(df[d].to_numpy(dtype=np.float64)) for d in dimensions])
+    if len(df) <= len(dimensions) + 1:
+        return float('nan'), {}, float('nan')
+    coefficients, _, _, _ = np.linalg.lstsq(X, y, rcond=None)
+    residuals = y - X @ coefficients
+    total = ((y - y.mean()) ** 2).sum()
+    r2 = 1 - (residuals ** 2).sum() / total if total else float('nan')
+    return coefficients[0], dict(zip(dimensions, coefficients[1:])), r2
+
+
+def scaling(df, metrics):
+    """One row of fitted exponents per (lib, ext, metric)."""
+    rows = []
+    for (lib, ext), cell in df.groupby(['lib', 'ext']):
+        for metric in metrics:
+            row = dict(lib=lib, ext=ext, metric=metric, n_cells=len(cell))
+            log_a, exponents, r2 = fit_power_law(cell, metric, DIMENSIONS)
+            row.update({f'exponent_{d}': exponents.get(d, float('nan')) for d in DIMENSIONS}, r2=r2)
+            log_a, exponents, r2 = fit_power_law(cell, metric, ['samples'])
+            row.update(
+                coefficient=10 ** log_a,
+                exponent_samples=exponents.get('samples', float('nan')),
+                r2_samples=r2,
+            )
+            rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def plot_scaling(df, fits, metric, path):
+    sns.set_style("whitegrid")
+    libs = sorted(df.lib.unique())
+    palette = dict(zip(libs, sns.color_palette(n_colors=len(libs))))
+    g = sns.relplot(
+        x='samples',
+        y=metric,
+        hue='lib',
+        col='ext',
+        data=df,
+        palette=palette,
+        height=4,
+        aspect=1,
+    )
+    for ext, ax in g.axes_dict.items():
+        for lib, color in palette.items():
+            fit = fits[(fits.lib == lib) & (fits.ext == ext) & (fits.metric == metric)]
+            cell = df[(df.lib == lib) & (df.ext == ext)]
+            if fit.empty or cell.empty or np.isnan(fit.exponent_samples.iloc[0]):
+                continue
+            n = np.geomspace(cell.samples.min(), cell.samples.max(), 50)
+            ax.plot(n, fit.coefficient.iloc[0] * n ** fit.exponent_samples.iloc[0], color=color)
+    g.set(xscale="log", yscale="log")
+    g.savefig(path)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Fit scaling curves of time and memory against channels, sample rate and duration.')
+    parser.add_argument('--results', type=str, default='results/benchmark')
+    parser.add_argument('--metrics', type=str, nargs='+', default=['time', 'peak_rss_delta_MB'])
+    parser.add_argument('--dtype', type=str, default='float32')
+    parser.add_argument('--out', type=str, default='results/scaling')
+    args = parser.parse_args()
+
+    df = read_results(args.results)
+    # in-process loading, one row per cell
+    df = df[(df['measure'] == 'memory') & (df['workers'] == 0) & (df['dtype'] == args.dtype)]
+    df = df.dropna(subset=DIMENSIONS)
+    df['samples'] = df['duration'] * df['channels'] * df['sample_rate']
+
+    fits = scaling(df, args.metrics)
+    fits.to_csv(args.out + '.csv', index=False)
+    print(fits.to_string(index=False))
+    for metric in args.metrics:
+        plot_scaling(df, fits, metric, f"{args.out}_{metric}.png")
+    print(f"Scaling curves saved to: {args.out}.csv")
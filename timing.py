@@ -0,0 +1,123 @@
+"""
+Timing engine shared by the benchmark scripts.
+
+Every call is timed on its own with `time.perf_counter_ns`. The first
+`warmup` calls are discarded, then calls are repeated until the 95%
+confidence interval of the mean is within `rel_ci` of the mean or the
+`time_budget` (in seconds) is used up. The summary keeps the raw samples
+next to the mean, standard deviation and tail percentiles.
+"""
+import time
+
+import numpy as np
+
+
+COLUMNS = [
+    'time',
+    'time_std',
+    'time_p50',
+    'time_p95',
+    'time_p99',
+    'time_ci95',
+    'n_samples',
+    'samples_ns',
+]
+
+DEFAULTS = dict(
+    repeat=3,
+    warmup=1,
+    max_repeat=50,
+    time_budget=10.0,
+    rel_ci=0.02,
+)
+
+
+def add_arguments(parser):
+    parser.add_argument('--repeat', type=int, default=DEFAULTS['repeat'],
+                        help='Minimum number of timed passes over the files.')
+    parser.add_argument('--warmup', type=int, default=DEFAULTS['warmup'],
+                        help='Number of untimed warmup calls.')
+    parser.add_argument('--max-repeat', type=int, default=DEFAULTS['max_repeat'],
+                        help='Maximum number of timed passes over the files.')
+    parser.add_argument('--time-budget', type=float, default=DEFAULTS['time_budget'],
+                        help='Stop repeating after this many seconds per cell.')
+    parser.add_argument('--rel-ci', type=float, default=DEFAULTS['rel_ci'],
+                        help='Stop repeating once the 95%% CI half-width is below this fraction of the mean.')
+
+
+def options(args):
+    """Timing options from parsed `add_arguments` arguments."""
+    return {key: getattr(args, key) for key in DEFAULTS}
+
+
+def to_argv(options):
+    """Command line flags that reproduce `options` (e.g. for worker.py)."""
+    argv = []
+    for key, value in options.items():
+        argv += ['--' + key.replace('_', '-'), str(value)]
+    return argv
+
+
+def summarize(samples_ns):
+    if not samples_ns:
+        summary = {key: float('nan') for key in COLUMNS}
+        summary.update(n_samples=0, samples_ns=[])
+        return summary
+    samples = np.asarray(samples_ns, dtype=np.float64) / 1e9
+    std = samples.std(ddof=1) if len(samples) > 1 else 0.0
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    return dict(
+        time=samples.mean(),
+        time_std=std,
+        time_p50=p50,
+        time_p95=p95,
+        time_p99=p99,
+        time_ci95=1.96 * std / np.sqrt(len(samples)),
+        n_samples=len(samples),
+        samples_ns=list(samples_ns),
+    )
+
+
+def measure(fn, inputs, repeat=3, warmup=1, max_repeat=50, time_budget=10.0, rel_ci=0.02,
+            before_pass=None):
+    """
+    Call `fn(x)` cycling through `inputs` and return the `summarize`d
+    per-call timings. `repeat` and `max_repeat` are the minimum and maximum
+    number of timed passes over `inputs`. Failing calls are reported and
+    not counted as samples. `before_pass()` is called, untimed, before
+    every timed pass (e.g. to evict the files from the page cache).
+    """
+    inputs = list(inputs)
+    if not inputs:
+        return summarize([])
+    min_calls = repeat * len(inputs)
+    max_calls = max(max_repeat, repeat) * len(inputs)
+
+    for i in range(warmup):
+        try:
+            fn(inputs[i % len(inputs)])
+        except Exception as e:
+            print(f"[error] Warmup call {i}, input {inputs[i % len(inputs)]}: {e}")
+
+    samples_ns = []
+    start = time.perf_counter()
+    for i in range(max_calls):
+        x = inputs[i % len(inputs)]
+        if before_pass is not None and i % len(inputs) == 0:
+            before_pass()
+        try:
+            t0 = time.perf_counter_ns()
+            fn(x)
+            samples_ns.append(time.perf_counter_ns() - t0)
+        except Exception as e:
+            print(f"[error] Call {i}, input {x}: {e}")
+        # only stop after complete passes, so that every input is sampled equally
+        if i + 1 < min_calls or (i + 1) % len(inputs) or len(samples_ns) < 2:
+            continue
+        if time.perf_counter() - start > time_budget:
+            break
+        samples = np.asarray(samples_ns, dtype=np.float64)
+        ci = 1.96 * samples.std(ddof=1) / np.sqrt(len(samples))
+        if ci <= rel_ci * samples.mean():
+            break
+    return summarize(samples_ns)
@@ -1,25 +1,117 @@
 import numpy as np
 import subprocess as sp
 import os
+import glob
+import hashlib
+import json
 import pandas as pd
-import seaborn as sns
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
 
 DEVNULL = open(os.devnull, 'w')
 
 
-class DF_writer(object):
-    def __init__(self, columns):
-        self.df = pd.DataFrame(columns=columns)
+def default_worker_counts(max_workers=None):
+    """0, then powers of two up to (and including) the number of cores."""
+    max_workers = max_workers or os.cpu_count() or 1
+    counts = [0]
+    n = 1
+    while n < max_workers:
+        counts.append(n)
+        n *= 2
+    counts.append(max_workers)
+    return counts
+
+
+class ResultStore(object):
+    """
+    Append-only store of benchmark results in the directory `path`.
+
+    Every completed cell (e.g. one ext, lib and duration) is written at
+    once as its own Parquet file, named after the cell, so that a crash only
+    loses the running cell and a rerun can skip the cells that are `done`.
+    Keys of a row that are not in `columns` are dropped. `config` holds the
+    options that change the results of a cell without being part of it
+    (e.g. the swept worker counts): its hash is part of the file names and
+    the `config` column of the rows, so a cell is only `done` for the same
+    options, and it is saved as `config_<hash>.json` next to the results.
+    """
+
+    def __init__(self, path, columns, config=None):
+        self.path = path
         self.columns = columns
+        self.config_id = None
+        os.makedirs(path, exist_ok=True)
+        if config:
+            text = json.dumps(config, sort_keys=True, default=str)
+            self.config_id = hashlib.sha1(text.encode()).hexdigest()[:10]
+            with open(os.path.join(path, f'config_{self.config_id}.json'), 'w') as f:
+                f.write(text)
+
+    def _name(self, cell):
+        name = '__'.join(f"{key}={value}" for key, value in cell.items())
+        if self.config_id:
+            name += f"__config={self.config_id}"
+        return name.replace(os.sep, '_')
+
+    def _file(self, cell):
+        return os.path.join(self.path, self._name(cell) + '.parquet')
+
+    def artifact(self, cell, suffix, directory):
+        """Path of a side file of `cell` (e.g. its profile) in the sub-directory `directory`."""
+        os.makedirs(os.path.join(self.path, directory), exist_ok=True)
+        return os.path.join(self.path, directory, self._name(cell) + suffix)
+
+    def done(self, **cell):
+        return os.path.exists(self._file(cell))
+
+    def write(self, cell, rows):
+        """Write the `rows` of `cell`, each extended by the cell's keys."""
+        if not rows:
+            return
+        df = pd.DataFrame([dict(row, **cell) for row in rows], columns=self.columns)
+        if self.config_id:
+            df['config'] = self.config_id
+        path = self._file(cell)
+        # write to a temporary file first, so that a crash never leaves a
+        # partially written cell that a rerun would skip
+        df.to_parquet(path + '.tmp', index=False)
+        os.replace(path + '.tmp', path)
+
+    @property
+    def df(self):
+        return read_results(self.path)
+
 
-    def append(self, **kwargs):
-        idx = len(self.df)
-        self.df.loc[idx] = kwargs
+def read_results(path, config=None):
+    """
+    The results in the `ResultStore` directory `path`, as one DataFrame.
+    A cell that was run with several configurations is only read for the
+    one written last, unless `config` selects a configuration by its hash
+    (or is 'all', for every configuration of every cell). `path` can also be
+    a single CSV, pickle or Parquet file of results.
+    """
+    if os.path.isfile(path):
+        readers = {'.csv': pd.read_csv, '.pickle': pd.read_pickle, '.parquet': pd.read_parquet}
+        return readers[os.path.splitext(path)[1]](path)
+    files = sorted(glob.glob(os.path.join(path, '*.parquet')))
+    if config is None:
+        latest = {}
+        for fp in files:
+            cell = os.path.basename(fp)[:-len('.parquet')].rsplit('__config=', 1)[0]
+            if cell not in latest or os.path.getmtime(fp) >= os.path.getmtime(latest[cell]):
+                latest[cell] = fp
+        files = sorted(latest.values())
+    elif config != 'all':
+        files = [fp for fp in files if fp.endswith(f'__config={config}.parquet')]
+    if not files:
+        raise FileNotFoundError(f"No results in '{path}'")
+    return pd.concat([pd.read_parquet(fp) for fp in files], ignore_index=True)
 
 def plot_results(df, target_lib="", audio_format="", ext="png"):
+    # imported here, so that the benchmarks do not pay for the plotting libraries
+    import seaborn as sns
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
     sns.set_style("whitegrid")
 
     ordered_libs = df.time.groupby(
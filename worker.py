@@ -0,0 +1,454 @@
+"""
+Run one benchmark cell (a loader on a list of files) in a fresh interpreter.
+
+The parent calls `spawn`, which starts this script with `sys.executable`
+and parses the `[result]` line it prints as the last line of its output.
+Running every cell in its own process means that nothing (imported
+backends, codec state, warmed caches) leaks from one loader to the next.
+"""
+import argparse
+import functools
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+import psutil
+
+import timing
+
+
+def run_coldstart(lib, files, options, tensor=True, dtype='float32'):
+    """
+    Time the start-up of a loader separately from its steady state:
+    importing torch, importing the backend, the first decode (including
+    lazy codec and library initialization) and the warm per-file latency.
+    """
+    start = time.perf_counter()
+    import torch
+    torch_import_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    import loaders
+    loader = loaders.get_loader(lib)
+    loader.import_modules()
+    import_time = time.perf_counter() - start
+
+    load = functools.partial(loader.load, dtype=dtype)
+    calls = [0]
+
+    def call(fp):
+        audio = load(fp)
+        if tensor:
+            _ = loaders.as_tensor(audio).max()
+        calls[0] += 1
+
+    start = time.perf_counter()
+    call(files[0])
+    first_call_time = time.perf_counter() - start
+
+    # the first call above already is the warmup
+    loaders.reset_phases()
+    calls[0] = 0
+    result = timing.measure(call, files, **dict(options, warmup=0))
+    result.update(loaders.phase_times(calls[0]))
+    result.update(
+        torch_import_time=torch_import_time,
+        import_time=import_time,
+        first_call_time=first_call_time,
+        warm_time=result['time'],
+    )
+    return result
+
+
+def _reset_peak_rss():
+    # Linux >= 4.0 resets the peak RSS (VmHWM) when writing 5 to clear_refs
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def _peak_rss_bytes():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+
+class ChildrenPeakRSS(threading.Thread):
+    """
+    Sample the summed RSS of all child processes (the ffmpeg decoders of
+    stempeg, audioread or pydub) in the background. RUSAGE_CHILDREN cannot be
+    used, as forked children report the RSS of this process at fork time.
+    """
+
+    def __init__(self, interval=0.005):
+        super(ChildrenPeakRSS, self).__init__(daemon=True)
+        self.interval = interval
+        self.peak = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        process = psutil.Process()
+        while not self._stop_event.is_set():
+            rss = 0
+            for child in process.children(recursive=True):
+                try:
+                    rss += child.memory_info().rss
+                except psutil.Error:
+                    pass
+            self.peak = max(self.peak, rss)
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        return self.peak
+
+
+def run_memory(lib, files, options, tensor=True, frames_per_chunk=None, dtype='float32'):
+    """
+    Time the loader on `files` (or, with `frames_per_chunk`, the streaming
+    variant of the loader, consuming one chunk at a time) and report the
+    decoded samples per second, the peak RSS of this
+    process (and its increase over the RSS after all imports), the sampled
+    peak RSS of the ffmpeg children, and the Python heap peak from an extra
+    pass under tracemalloc (kept out of the timed passes because it slows
+    down allocations).
+    """
+    import torch
+    import loaders
+    loader = loaders.get_loader(lib)
+    loader.import_modules()
+    load = functools.partial(loader.load, dtype=dtype)
+    iter_chunks = loader.iter_chunks
+    baseline_rss = psutil.Process().memory_info().rss
+    _reset_peak_rss()
+    decoded = dict(calls=0, samples=0)
+
+    def consume(audio):
+        if tensor:
+            audio = loaders.as_tensor(audio)
+            _ = audio.max()
+            return audio.numel()
+        return np.size(audio)
+
+    def call(fp):
+        if frames_per_chunk:
+            samples = sum(consume(chunk) for chunk in iter_chunks(fp, frames_per_chunk))
+        else:
+            samples = consume(load(fp))
+        decoded['calls'] += 1
+        decoded['samples'] += samples
+
+    children = ChildrenPeakRSS()
+    children.start()
+    loaders.reset_phases()
+    result = timing.measure(call, files, **options)
+    children_peak_rss = children.stop()
+    peak_rss = _peak_rss_bytes()
+    # before the tracemalloc pass, which slows down all phases
+    result.update(loaders.phase_times(decoded['calls']))
+
+    tracemalloc.start()
+    for fp in files:
+        call(fp)
+    _, tracemalloc_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    samples_per_call = decoded['samples'] / decoded['calls'] if decoded['calls'] else float('nan')
+    result.update(
+        throughput_files_per_sec=1.0 / result['time'],
+        samples_per_sec=samples_per_call / result['time'],
+        baseline_rss_MB=baseline_rss / 1024 / 1024,
+        peak_rss_MB=peak_rss / 1024 / 1024,
+        peak_rss_delta_MB=max(peak_rss - baseline_rss, 0) / 1024 / 1024,
+        tracemalloc_peak_MB=tracemalloc_peak / 1024 / 1024,
+        children_peak_rss_MB=children_peak_rss / 1024 / 1024,
+    )
+    return result
+
+
+def run_dataloader(lib, files, options, tensor=True, dtype='float32', num_workers=1):
+    """
+    Time every item drawn from a `torch.utils.data.DataLoader` with
+    `num_workers` persistent worker processes, started during the warmup.
+    The peak RSS of the children is the peak RSS of the DataLoader workers
+    (and their ffmpeg decoders). Tensors are always created, by the workers,
+    which send the phase times of every item along with it.
+    """
+    import torch
+    import loaders
+    from dataset import AudioFolder
+    dataset = AudioFolder(os.path.dirname(files[0]), lib=lib, files=files, dtype=dtype, phases=True)
+    loader = torch.utils.data.DataLoader(
+        dataset, batch_size=1, num_workers=num_workers, persistent_workers=True
+    )
+    baseline_rss = psutil.Process().memory_info().rss
+    _reset_peak_rss()
+    decoded = dict(calls=0, samples=0)
+    phase_ns = dict.fromkeys(loaders.PHASES, 0)
+
+    def batches():
+        while True:
+            for batch in loader:
+                yield batch
+
+    items = batches()
+
+    def call(fp):
+        # `fp` only counts the passes, the DataLoader picks the files
+        batch, phases = next(items)
+        _ = batch.max()
+        decoded['calls'] += 1
+        decoded['samples'] += batch.numel()
+        for phase in loaders.PHASES:
+            phase_ns[phase] += int(phases[phase].sum())
+
+    children = ChildrenPeakRSS()
+    children.start()
+    result = timing.measure(call, files, **options)
+    children_peak_rss = children.stop()
+    peak_rss = _peak_rss_bytes()
+
+    samples_per_call = decoded['samples'] / decoded['calls'] if decoded['calls'] else float('nan')
+    result.update(loaders.phase_times(decoded['calls'], phase_ns))
+    result.update(
+        throughput_files_per_sec=1.0 / result['time'],
+        samples_per_sec=samples_per_call / result['time'],
+        baseline_rss_MB=baseline_rss / 1024 / 1024,
+        peak_rss_MB=peak_rss / 1024 / 1024,
+        peak_rss_delta_MB=max(peak_rss - baseline_rss, 0) / 1024 / 1024,
+        tracemalloc_peak_MB=float('nan'),
+        children_peak_rss_MB=children_peak_rss / 1024 / 1024,
+    )
+    return result
+
+
+def run_pagecache(lib, files, options, tensor=True, dtype='float32'):
+    """
+    Time the loader with the files evicted from the page cache before every
+    pass (cold, the first epoch on a large dataset) and with the files
+    cached (warm), and count the bytes read from storage per file. The
+    timing columns are those of the cold passes.
+    """
+    import torch
+    import loaders
+    import pagecache
+    loader = loaders.get_loader(lib)
+    loader.import_modules()
+    load = functools.partial(loader.load, dtype=dtype)
+    calls = [0]
+
+    def call(fp):
+        audio = load(fp)
+        if tensor:
+            _ = loaders.as_tensor(audio).max()
+        calls[0] += 1
+
+    def read_per_file(fn):
+        calls[0] = 0
+        before = pagecache.disk_read_bytes()
+        result = fn()
+        after = pagecache.disk_read_bytes()
+        if before is None or not calls[0]:
+            return result, float('nan')
+        return result, (after - before) / calls[0]
+
+    # warm up the library on a file that is evicted again before timing
+    call(files[0])
+    evicted = pagecache.evict(files)
+    loaders.reset_phases()
+    cold, cold_read = read_per_file(lambda: timing.measure(
+        call, files, **dict(options, warmup=0, before_pass=lambda: pagecache.evict(files))
+    ))
+    cold.update(loaders.phase_times(calls[0]))
+    # one untimed pass caches all files
+    warm, warm_read = read_per_file(lambda: timing.measure(call, files, **dict(options, warmup=len(files))))
+    result = dict(cold)
+    result.update(
+        cold_time=cold['time'],
+        cold_time_p95=cold['time_p95'],
+        warm_time=warm['time'],
+        warm_time_p95=warm['time_p95'],
+        cold_warm_ratio=cold['time'] / warm['time'],
+        cold_disk_read_KB=cold_read / 1024,
+        warm_disk_read_KB=warm_read / 1024,
+        evicted=evicted == len(files),
+    )
+    return result
+
+
+def run_training(lib, files, options, tensor=True, dtype='float32', num_workers=0, batch_size=16,
+                 crop_seconds=1.0, sample_rate=None):
+    """
+    Emulate the input pipeline of a training epoch: a random crop of every
+    file (see `dataset.RandomCrops`), in a new order every epoch, batched by
+    a `torch.utils.data.DataLoader` with `num_workers` persistent workers.
+    One timed call is one batch, so the timing columns are the per-batch
+    latency as seen by the training loop (its tail is what stalls the GPU)
+    and `samples_per_sec` is the sustained throughput. Tensors are always
+    created, by the workers.
+    """
+    import torch
+    from dataset import EpochSampler, RandomCrops
+    dataset = RandomCrops(os.path.dirname(files[0]), lib=lib, files=files, dtype=dtype,
+                          crop_seconds=crop_seconds, sample_rate=sample_rate)
+    sampler = EpochSampler(len(dataset))
+    loader = torch.utils.data.DataLoader(
+        dataset, batch_size=batch_size, sampler=sampler, num_workers=num_workers,
+        persistent_workers=num_workers > 0, drop_last=len(dataset) >= batch_size,
+    )
+    decoded = dict(calls=0, items=0, samples=0)
+
+    def batches():
+        epoch = 0
+        while True:
+            sampler.set_epoch(epoch)
+            for batch in loader:
+                yield batch
+            epoch += 1
+
+    items = batches()
+
+    def call(index):
+        # `index` only counts the batches, the sampler picks the files
+        batch = next(items)
+        _ = batch.max()
+        decoded['calls'] += 1
+        decoded['items'] += batch.shape[0]
+        decoded['samples'] += batch.numel()
+
+    children = ChildrenPeakRSS()
+    children.start()
+    # until every worker has delivered its first batches
+    warmup = max(options.get('warmup', 1), min(len(loader), 2 * num_workers))
+    result = timing.measure(call, range(len(loader)), **dict(options, warmup=warmup))
+    children_peak_rss = children.stop()
+
+    decoded_calls = max(decoded['calls'], 1)
+    result.update(
+        batch_size=batch_size,
+        crop_seconds=crop_seconds,
+        resample=sample_rate or 0,
+        items_per_sec=decoded['items'] / decoded_calls / result['time'],
+        samples_per_sec=decoded['samples'] / decoded_calls / result['time'],
+        peak_rss_MB=_peak_rss_bytes() / 1024 / 1024,
+        children_peak_rss_MB=children_peak_rss / 1024 / 1024,
+    )
+    return result
+
+
+RUNNERS = {
+    'coldstart': run_coldstart,
+    'memory': run_memory,
+    'dataloader': run_dataloader,
+    'pagecache': run_pagecache,
+    'training': run_training,
+}
+
+
+def spawn(measure, lib, files, options=None, tensor=True, frames_per_chunk=None,
+          dtype='float32', num_workers=None, cpus=None, timeout=None, profile=None,
+          profiler='auto', training=None):
+    """
+    Run `measure` for `lib` on `files` in a new interpreter and return its
+    result dict. `options` are the `timing.measure` options. With `cpus`,
+    the child (and every process it starts) is pinned to these CPUs by
+    `taskset`, not by a `preexec_fn`, which can deadlock when cells are
+    spawned from several threads.
+    `process_time` is the wall time of the whole child process as seen by
+    the parent, including interpreter start-up. With `profile`, the child
+    is sampled and the collapsed stacks are written to this path, by
+    py-spy (`profiler='py-spy'`, or 'auto' if it is installed) or by the
+    `profiler.SamplingProfiler` of the child ('python'). `training` are
+    the `batch_size`, `crop_seconds` and `sample_rate` of `run_training`.
+    """
+    cmd = [sys.executable, __file__, measure, '--lib', lib]
+    cmd += timing.to_argv(options or timing.DEFAULTS)
+    if not tensor:
+        cmd.append('--no-tensor')
+    if frames_per_chunk:
+        cmd += ['--frames-per-chunk', str(frames_per_chunk)]
+    cmd += ['--dtype', dtype]
+    if num_workers is not None:
+        cmd += ['--num-workers', str(num_workers)]
+    for key, value in (training or {}).items():
+        if value is not None:
+            cmd += ['--' + key.replace('_', '-'), str(value)]
+    if profile is not None:
+        import profiler as sampling
+        if profiler == 'py-spy' or (profiler == 'auto' and sampling.py_spy_available()):
+            cmd = sampling.py_spy_command(profile) + cmd
+        else:
+            cmd += ['--profile', profile]
+    cmd += list(files)
+    if cpus is not None:
+        if shutil.which('taskset'):
+            cmd = ['taskset', '--cpu-list', ','.join(map(str, cpus))] + cmd
+        else:
+            print(f"[skip] taskset not found, not pinning '{lib}' to CPUs {cpus}")
+    start = time.perf_counter()
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                          universal_newlines=True, timeout=timeout)
+    process_time = time.perf_counter() - start
+    for line in reversed(proc.stdout.splitlines()):
+        if line.startswith('[result] '):
+            result = json.loads(line[len('[result] '):])
+            result['process_time'] = process_time
+            return result
+    raise RuntimeError(
+        "Worker for '%s' failed with exit code %d: %s"
+        % (lib, proc.returncode, proc.stderr.strip().splitlines()[-1:] or '')
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Run a single benchmark cell in isolation.')
+    parser.add_argument('measure', type=str, choices=sorted(RUNNERS))
+    parser.add_argument('--lib', type=str, required=True)
+    timing.add_arguments(parser)
+    parser.add_argument('--no-tensor', action='store_true', help='Decode only, without converting to a tensor.')
+    parser.add_argument('--frames-per-chunk', type=int, default=None,
+                        help='Stream the files in chunks of this many frames (memory only).')
+    parser.add_argument('--dtype', type=str, default='float32', choices=['float32', 'int16'])
+    parser.add_argument('--num-workers', type=int, default=1,
+                        help='DataLoader worker processes (dataloader and training only).')
+    parser.add_argument('--batch-size', type=int, default=16, help='Batch size (training only).')
+    parser.add_argument('--crop-seconds', type=float, default=1.0, help='Random crop length (training only).')
+    parser.add_argument('--sample-rate', type=int, default=None,
+                        help='Resample the crops to this rate (training only).')
+    parser.add_argument('--profile', type=str, default=None,
+                        help='Sample the Python stack and write collapsed stacks to this file.')
+    parser.add_argument('files', type=str, nargs='+')
+    args = parser.parse_args()
+
+    params = dict(tensor=not args.no_tensor, dtype=args.dtype)
+    if args.frames_per_chunk:
+        params['frames_per_chunk'] = args.frames_per_chunk
+    if args.measure in ('dataloader', 'training'):
+        params['num_workers'] = args.num_workers
+    if args.measure == 'training':
+        params.update(batch_size=args.batch_size, crop_seconds=args.crop_seconds, sample_rate=args.sample_rate)
+    if args.profile:
+        import profiler
+        with profiler.SamplingProfiler() as sampler:
+            result = RUNNERS[args.measure](args.lib, args.files, timing.options(args), **params)
+        sampler.write(args.profile)
+    else:
+        result = RUNNERS[args.measure](args.lib, args.files, timing.options(args), **params)
+    print('[result] ' + json.dumps(result))